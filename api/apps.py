@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class ApiConfig(AppConfig):
     name = 'api'
+
+    def ready(self):
+        from . import cache, checks, facets, snapshot  # noqa: F401
+        cache.connect_signals()
+        facets.connect_signals()
+        snapshot.connect_signals()
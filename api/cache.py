@@ -0,0 +1,144 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from reviews.models import Category, Comment, Genre, GenreTitle, Review, Title
+from users.models import User
+from .snapshot import get_snapshot
+
+VERSION_KEY = 'catalog:version:{}'
+RESPONSE_KEY = 'catalog:response:{}:{}:{}'
+RATING_PRIOR_KEY = 'catalog:rating_prior'
+
+# Какие закэшированные ресурсы устаревают при изменении модели.
+INVALIDATES = {
+    Genre: ('genres', 'titles'),
+    Category: ('categories', 'titles'),
+    Title: ('titles',),
+    GenreTitle: ('titles',),
+    Review: ('titles', 'reviews'),
+    Comment: ('comments',),
+    User: ('users',),
+}
+
+
+def get_cache():
+    return caches[settings.CATALOG_CACHE_ALIAS]
+
+
+def get_version(resource):
+    """Время последнего изменения ресурса, оно же его версия."""
+    cache = get_cache()
+    key = VERSION_KEY.format(resource)
+    version = cache.get(key)
+    if version is None:
+        version = time.time()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_versions(resources):
+    """Сдвигает версии ресурсов вперёд не меньше чем на секунду.
+
+    ``Last-Modified`` берёт из версии целые секунды: без этого запись в ту
+    же секунду, что и чтение, не изменила бы его, и клиент с одним
+    ``If-Modified-Since`` получил бы устаревший ``304``.
+    """
+    cache = get_cache()
+    keys = [VERSION_KEY.format(resource) for resource in resources]
+    now = time.time()
+    old = cache.get_many(keys)
+    cache.set_many(
+        {key: max(now, old.get(key, now - 1) + 1) for key in keys}, None
+    )
+
+
+def get_rating_prior():
+    """Средняя оценка по каталогу для байесовского рейтинга."""
+    cache = get_cache()
+    prior = cache.get(RATING_PRIOR_KEY)
+    if prior is None:
+        prior = Title.objects.mean_score()
+        cache.set(RATING_PRIOR_KEY, prior, settings.RATING_PRIOR_TIMEOUT)
+    return prior
+
+
+def bump_on_commit(resources, using):
+    # До фиксации параллельный запрос ещё читает старые строки и положил
+    # бы их в кэш под новой версией.
+    transaction.on_commit(lambda: bump_versions(resources), using=using)
+
+
+def invalidate(sender, using, **kwargs):
+    bump_on_commit(INVALIDATES[sender], using)
+
+
+def invalidate_title_genres(sender, action, using, **kwargs):
+    if action.startswith('post_'):
+        bump_on_commit(INVALIDATES[Title], using)
+
+
+def connect_signals():
+    for model in INVALIDATES:
+        post_save.connect(invalidate, sender=model)
+        post_delete.connect(invalidate, sender=model)
+    m2m_changed.connect(
+        invalidate_title_genres, sender=Title.genre.through
+    )
+
+
+class CachedResponseMixin:
+    """Кэширует ответы list/retrieve до изменения ``cache_resource``.
+
+    Ответ отдаётся с ``ETag`` и ``Last-Modified``, на условный запрос
+    с совпадающей версией возвращается ``304 Not Modified`` без
+    обращения к базе данных.
+    """
+    cache_resource = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        version = get_version(self.cache_resource)
+        # Жанры и категории в ответах берутся из снимка каталога. Воркер,
+        # ещё не заметивший новый снимок, кладёт ответ под свой ключ и не
+        # подменяет ответы остальных.
+        variant = hashlib.md5('{}:{}:{}'.format(
+            request.accepted_renderer.format,
+            request.build_absolute_uri(),
+            get_snapshot().generation,
+        ).encode()).hexdigest()
+        etag = '"{}-{}"'.format(variant, repr(version))
+        last_modified = int(version)
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if not_modified is not None:
+            return not_modified
+        cache = get_cache()
+        key = RESPONSE_KEY.format(self.cache_resource, version, variant)
+        data = cache.get(key)
+        if data is not None:
+            response = Response(data)
+        else:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            cache.set(key, response.data, settings.CATALOG_CACHE_TIMEOUT)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+MESS_LOCAL_CATALOG_CACHE = (
+    'Кэш каталога {!r} не общий для процессов: воркеры не увидят '
+    'чужих изменений каталога и индекса фасетов'
+)
+MESS_LOCAL_PIN_CACHE = (
+    'Кэш закрепления за основной базой {!r} не общий для процессов: '
+    'после записи следующий запрос в другой воркер прочитает реплику'
+)
+HINT_SHARED_CACHE = 'Укажите в CACHE_URL общий кэш, например memcached'
+
+
+def cache_is_local(alias):
+    """Кэш живёт в памяти процесса и не виден другим."""
+    return settings.CACHES[alias]['BACKEND'] in LOCAL_CACHES
+
+
+def catalog_cache_is_local():
+    return cache_is_local(settings.CATALOG_CACHE_ALIAS)
+
+
+@register(Tags.caches, deploy=True)
+def check_catalog_cache(app_configs, **kwargs):
+    if not catalog_cache_is_local():
+        return []
+    return [Warning(
+        MESS_LOCAL_CATALOG_CACHE.format(settings.CATALOG_CACHE_ALIAS),
+        hint=HINT_SHARED_CACHE,
+        id='api.W001',
+    )]
+
+
+@register(Tags.caches, deploy=True)
+def check_replica_pin_cache(app_configs, **kwargs):
+    alias = settings.REPLICA_PIN_CACHE_ALIAS
+    if not settings.DATABASE_REPLICAS or not cache_is_local(alias):
+        return []
+    return [Warning(
+        MESS_LOCAL_PIN_CACHE.format(alias),
+        hint=HINT_SHARED_CACHE,
+        id='api.W002',
+    )]
@@ -0,0 +1,440 @@
+"""Фасетный поиск произведений по инвертированному индексу в памяти.
+
+Для каждого жанра, категории и года индекс хранит множество id
+произведений битовой маской в целом числе: бит N установлен, если
+произведение с id N подходит. Фильтры и счётчики фасетов считаются
+операциями над масками без обращения к базе.
+
+Индекс живёт в памяти процесса. Сигналы моделей после фиксации
+транзакции меняют его на месте и увеличивают общий счётчик поколений
+в кэше каталога; процесс, пропустивший изменение, видит чужое
+поколение и перестраивает индекс из базы в фоновом потоке, а запросы
+до конца перестройки отвечают по прежнему индексу. Ждёт перестройки
+только первый запрос процесса, когда индекса ещё нет.
+
+Счётчик поколений должен лежать в общем для процессов кэше
+(``CATALOG_CACHE_ALIAS``): в кэше в памяти каждый процесс видит только
+свои изменения. Это проверяет ``manage.py check --deploy``.
+"""
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from reviews.models import Category, Genre, GenreTitle, Title
+
+GENERATION_KEY = 'catalog:facets:generation'
+DIMENSIONS = ('genre', 'category', 'year')
+NAMED_DIMENSIONS = {'genre': Genre, 'category': Category}
+DB_FILTERS = ('name', 'search')
+
+
+if hasattr(int, 'bit_count'):
+    popcount = int.bit_count
+else:
+    def popcount(bitmap):
+        return bin(bitmap).count('1')
+
+
+def bitmap_from_ids(ids, size):
+    bits = bytearray(size // 8 + 1)
+    for pk in ids:
+        bits[pk >> 3] |= 1 << (pk & 7)
+    return int.from_bytes(bits, 'little')
+
+
+class BitmapIds:
+    """Возрастающие id из маски как последовательность для пагинатора."""
+
+    def __init__(self, bitmap):
+        self.bits = bin(bitmap)[:1:-1]
+        self.length = popcount(bitmap)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, page):
+        ids = []
+        position = self.bits.find('1')
+        for number in range(page.stop):
+            if position < 0:
+                break
+            if number >= page.start:
+                ids.append(position)
+            position = self.bits.find('1', position + 1)
+        return ids
+
+
+class FacetIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.generation = None
+        self.ready = False
+        self.rebuilding = None
+        self.failure = None
+        self.titles = {}
+        self.bitmaps = {}
+        self.names = {}
+        self.all = 0
+
+    def rebuild(self):
+        self.titles = {
+            pk: [category_id, year, set()]
+            for pk, category_id, year in Title.objects.values_list(
+                'id', 'category_id', 'year'
+            ).iterator()
+        }
+        for title_id, genre_id in GenreTitle.objects.values_list(
+            'title_id', 'genre_id'
+        ).iterator():
+            # Произведение, созданное между двумя запросами, попадёт в
+            # индекс при следующей перестройке: его создание сдвинет
+            # поколение.
+            if title_id in self.titles:
+                self.titles[title_id][2].add(genre_id)
+        groups = {dimension: defaultdict(list) for dimension in DIMENSIONS}
+        for pk, (category_id, year, genre_ids) in self.titles.items():
+            for genre_id in genre_ids:
+                groups['genre'][genre_id].append(pk)
+            if category_id is not None:
+                groups['category'][category_id].append(pk)
+            if year is not None:
+                groups['year'][year].append(pk)
+        size = max(self.titles, default=0)
+        self.all = bitmap_from_ids(self.titles, size)
+        self.bitmaps = {
+            dimension: defaultdict(int, {
+                key: bitmap_from_ids(ids, size) for key, ids in keys.items()
+            })
+            for dimension, keys in groups.items()
+        }
+        self.names = {
+            dimension: {
+                pk: (slug, name)
+                for pk, slug, name in model.objects.values_list(
+                    'id', 'slug', 'name'
+                )
+            }
+            for dimension, model in NAMED_DIMENSIONS.items()
+        }
+
+    def replace(self, other, generation):
+        """Подменяет содержимое индекса собранным ``other``."""
+        self.titles = other.titles
+        self.bitmaps = other.bitmaps
+        self.names = other.names
+        self.all = other.all
+        self.generation = generation
+        self.ready = True
+
+    def set_bits(self, pk, bit):
+        category_id, year, genre_ids = self.titles[pk]
+        for genre_id in genre_ids:
+            self.bitmaps['genre'][genre_id] |= bit
+        if category_id is not None:
+            self.bitmaps['category'][category_id] |= bit
+        if year is not None:
+            self.bitmaps['year'][year] |= bit
+
+    def clear_bits(self, pk):
+        if pk not in self.titles:
+            return
+        bit = 1 << pk
+        category_id, year, genre_ids = self.titles[pk]
+        for genre_id in genre_ids:
+            self.bitmaps['genre'][genre_id] &= ~bit
+        if category_id is not None:
+            self.bitmaps['category'][category_id] &= ~bit
+        if year is not None:
+            self.bitmaps['year'][year] &= ~bit
+
+    def save_title(self, pk, category_id, year):
+        self.clear_bits(pk)
+        genre_ids = self.titles.get(pk, (None, None, set()))[2]
+        self.titles[pk] = [category_id, year, genre_ids]
+        self.set_bits(pk, 1 << pk)
+        self.all |= 1 << pk
+
+    def delete_title(self, pk):
+        self.clear_bits(pk)
+        self.titles.pop(pk, None)
+        self.all &= ~(1 << pk)
+
+    def change_genres(self, pk, add=(), remove=(), clear=False):
+        if pk not in self.titles:
+            return
+        self.clear_bits(pk)
+        genre_ids = self.titles[pk][2]
+        if clear:
+            genre_ids.clear()
+        genre_ids.difference_update(remove)
+        genre_ids.update(add)
+        self.set_bits(pk, 1 << pk)
+
+    def rename(self, dimension, pk, slug, name):
+        self.names[dimension][pk] = (slug, name)
+
+    def union(self, dimension, keys):
+        bitmap = 0
+        for key in keys:
+            bitmap |= self.bitmaps[dimension].get(key, 0)
+        return bitmap
+
+    def slug_ids(self, dimension, slugs):
+        return [
+            pk for pk, (slug, _) in self.names[dimension].items()
+            if slug in slugs
+        ]
+
+    def search(self, constraints, base, dimensions):
+        """Маска результата и счётчики по ``dimensions``.
+
+        ``constraints`` сопоставляет измерению список ключей (id жанров,
+        категорий или годы), внутри измерения ключи объединяются по ИЛИ.
+        Счётчик значения считается без ограничения его же измерения,
+        чтобы клиент видел, сколько даст выбор другого значения.
+        """
+        masks = {
+            dimension: self.union(dimension, keys)
+            for dimension, keys in constraints.items()
+        }
+        result = base
+        for mask in masks.values():
+            result &= mask
+        facets = {}
+        for dimension in dimensions:
+            scope = base
+            for other, mask in masks.items():
+                if other != dimension:
+                    scope &= mask
+            counts = [
+                (key, popcount(scope & bitmap))
+                for key, bitmap in self.bitmaps[dimension].items()
+            ]
+            facets[dimension] = [
+                self.describe(dimension, key, count)
+                for key, count in sorted(
+                    counts, key=lambda item: (-item[1], item[0])
+                )
+                if count
+            ]
+        return result, facets
+
+    def describe(self, dimension, key, count):
+        if dimension not in NAMED_DIMENSIONS:
+            return {dimension: key, 'count': count}
+        slug, name = self.names[dimension].get(key, (None, None))
+        return {'slug': slug, 'name': name, 'count': count}
+
+
+index = FacetIndex()
+
+
+def get_cache():
+    return caches[settings.CATALOG_CACHE_ALIAS]
+
+
+def start_generation(cache):
+    # Отсчёт от текущего времени: после вытеснения ключа из кэша новое
+    # поколение не совпадёт ни с одним из уже выданных.
+    cache.add(GENERATION_KEY, int(time.time() * 1000000), None)
+
+
+def current_generation():
+    cache = get_cache()
+    start_generation(cache)
+    return cache.get(GENERATION_KEY)
+
+
+def next_generation():
+    cache = get_cache()
+    start_generation(cache)
+    try:
+        return cache.incr(GENERATION_KEY)
+    except ValueError:
+        start_generation(cache)
+        return cache.incr(GENERATION_KEY)
+
+
+def invalidate_index():
+    """Помечает устаревшими индексы всех процессов."""
+    next_generation()
+
+
+def on_commit(using, change):
+    def apply():
+        generation = next_generation()
+        with index.lock:
+            if index.generation == generation - 1:
+                change()
+                index.generation = generation
+            else:
+                index.generation = None
+    transaction.on_commit(apply, using=using)
+
+
+def rebuild_index(generation):
+    """Собирает индекс поколения ``generation`` вне блокировки."""
+    fresh = FacetIndex()
+    try:
+        fresh.rebuild()
+    except Exception as error:
+        with index.lock:
+            index.rebuilding = None
+            index.failure = error
+        raise
+    finally:
+        connections.close_all()
+    with index.lock:
+        index.replace(fresh, generation)
+        index.rebuilding = None
+        index.failure = None
+
+
+def refresh_index():
+    """Запускает перестройку устаревшего индекса; вызывается под lock.
+
+    Возвращает поток перестройки или ``None``, если индекс актуален.
+    Без ``FACETS_BACKGROUND_REBUILD`` (тесты) индекс собирается сразу.
+    Изменения, зафиксированные во время перестройки, сдвигают поколение,
+    и следующий запрос запустит её снова.
+    """
+    generation = current_generation()
+    if index.generation == generation:
+        return None
+    if not settings.FACETS_BACKGROUND_REBUILD:
+        fresh = FacetIndex()
+        fresh.rebuild()
+        index.replace(fresh, generation)
+        return None
+    if index.rebuilding is None:
+        index.rebuilding = threading.Thread(
+            target=rebuild_index,
+            args=(generation,),
+            name='yamdb-facets',
+            daemon=True,
+        )
+        index.rebuilding.start()
+    return index.rebuilding
+
+
+def mark_stale(using):
+    def apply():
+        next_generation()
+        with index.lock:
+            index.generation = None
+    transaction.on_commit(apply, using=using)
+
+
+def parse_constraints(data):
+    """Ограничения индекса из ``cleaned_data`` фильтра ``TitlesFilter``."""
+    constraints = {}
+    for dimension in NAMED_DIMENSIONS:
+        if data.get(dimension):
+            constraints[dimension] = index.slug_ids(
+                dimension, set(data[dimension])
+            )
+    years = None
+    if data.get('year') is not None:
+        years = {int(data['year'])}
+    if data.get('year__range'):
+        start, stop = (int(value) for value in data['year__range'])
+        in_range = {
+            year for year in index.bitmaps['year'] if start <= year <= stop
+        }
+        years = in_range if years is None else years & in_range
+    if years is not None:
+        constraints['year'] = years
+    return constraints
+
+
+def faceted_search(filterset, dimensions):
+    """Ищет по индексу, ``name`` и ``search`` фильтрует база."""
+    data = filterset.form.cleaned_data
+    base = None
+    if any(data.get(name) for name in DB_FILTERS):
+        queryset = Title.objects.all()
+        for name in DB_FILTERS:
+            if data.get(name):
+                queryset = filterset.filters[name].filter(
+                    queryset, data[name]
+                )
+        ids = list(queryset.values_list('id', flat=True))
+        base = bitmap_from_ids(ids, max(ids, default=0))
+    while True:
+        with index.lock:
+            rebuilding = refresh_index()
+            if index.ready:
+                if base is None:
+                    base = index.all
+                result, facets = index.search(
+                    parse_constraints(data), base, dimensions
+                )
+                return BitmapIds(result), facets
+        rebuilding.join()
+        with index.lock:
+            if not index.ready and index.failure is not None:
+                raise index.failure
+
+
+def title_saved(sender, instance, using, raw, **kwargs):
+    if not raw:
+        on_commit(using, lambda: index.save_title(
+            instance.pk, instance.category_id, instance.year
+        ))
+
+
+def title_deleted(sender, instance, using, **kwargs):
+    on_commit(using, lambda: index.delete_title(instance.pk))
+
+
+def title_genres_changed(sender, instance, action, reverse, pk_set, using,
+                         **kwargs):
+    if not action.startswith('post_'):
+        return
+    change = {'post_add': 'add', 'post_remove': 'remove'}.get(action)
+    if not reverse:
+        if change:
+            on_commit(using, lambda: index.change_genres(
+                instance.pk, **{change: pk_set}
+            ))
+        else:
+            on_commit(using, lambda: index.change_genres(
+                instance.pk, clear=True
+            ))
+        return
+    if change is None:
+        # Жанр отвязан от всех произведений: проще перестроить индекс.
+        mark_stale(using)
+        return
+    for title_id in pk_set:
+        on_commit(using, lambda title_id=title_id: index.change_genres(
+            title_id, **{change: {instance.pk}}
+        ))
+
+
+def named_saved(sender, instance, using, raw, **kwargs):
+    if raw:
+        return
+    dimension = 'genre' if sender is Genre else 'category'
+    on_commit(using, lambda: index.rename(
+        dimension, instance.pk, instance.slug, instance.name
+    ))
+
+
+def named_deleted(sender, instance, using, **kwargs):
+    # Удаление меняет связи без сигналов (SET_NULL, каскад).
+    mark_stale(using)
+
+
+def connect_signals():
+    post_save.connect(title_saved, sender=Title)
+    post_delete.connect(title_deleted, sender=Title)
+    m2m_changed.connect(title_genres_changed, sender=Title.genre.through)
+    for model in NAMED_DIMENSIONS.values():
+        post_save.connect(named_saved, sender=model)
+        post_delete.connect(named_deleted, sender=model)
@@ -1,22 +1,45 @@
 from django_filters import rest_framework as filters
 
 from reviews.models import Title
+from .snapshot import resolve_slugs
+
+
+class CharInFilter(filters.BaseInFilter, filters.CharFilter):
+    pass
+
+
+class NumberRangeFilter(filters.BaseRangeFilter, filters.NumberFilter):
+    pass
 
 
 class TitlesFilter(filters.FilterSet):
+    """Жанр и категория принимают несколько слагов через запятую.
+
+    Слаги переводятся в id по снимку каталога, таблицы жанров и
+    категорий в запрос не попадают.
+    """
     name = filters.CharFilter(
         field_name='name',
         lookup_expr='icontains'
     )
-    genre = filters.CharFilter(
-        field_name='genre__slug',
-        lookup_expr='icontains'
-    )
-    category = filters.CharFilter(
-        field_name='category__slug',
-        lookup_expr='icontains'
-    )
+    genre = CharInFilter(method='filter_genre')
+    category = CharInFilter(method='filter_category')
+    year__range = NumberRangeFilter(field_name='year', lookup_expr='range')
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Title
-        fields = ['name', 'year', 'genre', 'category']
+        fields = [
+            'name', 'year', 'year__range', 'genre', 'category', 'search'
+        ]
+
+    def filter_genre(self, queryset, name, value):
+        return queryset.filter(
+            genre__in=resolve_slugs('genre', value)
+        ).distinct()
+
+    def filter_category(self, queryset, name, value):
+        return queryset.filter(category__in=resolve_slugs('category', value))
+
+    def filter_search(self, queryset, name, value):
+        return queryset.search(value)
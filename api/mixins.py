@@ -1,4 +1,17 @@
-from rest_framework import mixins, viewsets
+from django.conf import settings
+from django.db import router, transaction
+from django.shortcuts import get_object_or_404
+from django.utils.functional import cached_property
+from rest_framework import mixins, permissions, status, viewsets
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from api_yamdb import routers
+from reviews.utils import bulk_insert
+from .cache import INVALIDATES, bump_on_commit
+
+MESS_BULK_SIZE = 'Ожидается список от 1 до {} объектов'
 
 
 class DestroyCreateListViewSet(
@@ -8,3 +21,211 @@ class DestroyCreateListViewSet(
     viewsets.GenericViewSet,
 ):
     pass
+
+
+class SparseFieldsMixin:
+    """Поля ответа из ``?fields=`` и вложенные объекты из ``?expand=``.
+
+    Оба параметра принимают имена через запятую. Без ``expand``
+    разворачиваются связи из ``default_expand``, поэтому ответ без
+    параметров не меняется. Колонки ``required_fields`` читаются всегда.
+    """
+    sparse_actions = ('list', 'retrieve')
+    default_expand = ()
+    required_fields = ('id',)
+
+    def get_list_param(self, name):
+        if self.action not in self.sparse_actions:
+            return None
+        value = self.request.query_params.get(name)
+        if value is None:
+            return None
+        return {item.strip() for item in value.split(',') if item.strip()}
+
+    @cached_property
+    def requested_fields(self):
+        return self.get_list_param('fields')
+
+    @cached_property
+    def expanded_fields(self):
+        expand = self.get_list_param('expand')
+        return set(self.default_expand) if expand is None else expand
+
+    def is_requested(self, name):
+        return self.requested_fields is None or name in self.requested_fields
+
+    def is_expanded(self, name):
+        return self.is_requested(name) and name in self.expanded_fields
+
+    def sparse_columns(self, columns):
+        return [
+            column for column in columns
+            if column in self.required_fields or self.is_requested(column)
+        ]
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.requested_fields
+        context['expand'] = self.expanded_fields
+        return context
+
+
+class AuthorQuerySetMixin(SparseFieldsMixin):
+    """Подгружает автора одним JOIN и только нужные колонки.
+
+    Поля из ``heavy_fields`` не читаются там, где они не отдаются
+    клиенту (удаление объекта). Автор не подгружается, если его нет в
+    ``?fields=``, и читается целиком для ``?expand=author``.
+    """
+    only_fields = ()
+    author_fields = ('author__username',)
+    expanded_author_fields = (
+        'author__username',
+        'author__first_name',
+        'author__last_name',
+        'author__bio',
+    )
+    heavy_fields = ('text',)
+    lean_actions = ('destroy',)
+
+    def optimize_queryset(self, queryset):
+        columns = self.sparse_columns(self.only_fields)
+        if self.is_requested('author'):
+            queryset = queryset.select_related('author')
+            columns += ['author', *(
+                self.expanded_author_fields if self.is_expanded('author')
+                else self.author_fields
+            )]
+        queryset = queryset.only(*columns)
+        if self.action in self.lean_actions:
+            queryset = queryset.defer(*self.heavy_fields)
+        return queryset
+
+
+class NestedParentMixin:
+    """Находит родительский объект вложенного ресурса одним запросом.
+
+    ``parent_lookups`` сопоставляет поля ``parent_model`` с именованными
+    параметрами URL, поэтому принадлежность отзыва произведению
+    проверяется тем же запросом по индексу, что и поиск самого отзыва.
+    """
+    parent_model = None
+    parent_lookups = {}
+    parent_fields = ('id',)
+
+    def get_parent(self):
+        if not hasattr(self, '_parent'):
+            lookups = {
+                field: self.kwargs[kwarg]
+                for field, kwarg in self.parent_lookups.items()
+            }
+            self._parent = get_object_or_404(
+                self.parent_model.objects.only(*self.parent_fields),
+                **lookups
+            )
+        return self._parent
+
+
+class ReplicaReadMixin:
+    """Читает безопасные запросы с реплики.
+
+    После успешного изменяющего запроса пользователь на
+    ``REPLICA_PIN_SECONDS`` закрепляется за основной базой, чтобы сразу
+    видеть свои изменения.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        user = request.user
+        if (request.method in permissions.SAFE_METHODS
+                and not (user.is_authenticated
+                         and routers.is_pinned(user.id))):
+            self.replica_token = routers.use_replica()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, 'replica_token', None)
+        if token is not None:
+            routers.reset(token)
+            self.replica_token = None
+        user = getattr(request, 'user', None)
+        if (request.method not in permissions.SAFE_METHODS
+                and user is not None and user.is_authenticated
+                and response.status_code < 400):
+            routers.pin_to_primary(user.id)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class BulkCreateViewSet(ReplicaReadMixin, viewsets.GenericViewSet):
+    """Создаёт список объектов в одной транзакции.
+
+    Каждый элемент проверяется сериализатором отдельно, затем
+    ``check_batch`` проверяет родителей и дубликаты одним запросом на
+    пакет, а ``bulk_create`` вставляет все прошедшие проверку элементы.
+    Ответ повторяет порядок запроса: ``status`` 201 и созданный объект
+    или 400 и ошибки элемента. Код ответа 201, если создан хотя бы один
+    объект.
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def check_batch(self, items):
+        """Ошибки ``{индекс: ошибки}`` для проверенных по отдельности."""
+        return {}
+
+    def bulk_create(self, instances):
+        """Вставляет прошедшие проверку объекты внутри транзакции ``create``.
+
+        У вставленных объектов должны появиться id для ответа. Версии
+        кэша модели сдвигаются после фиксации. Наследник переопределяет
+        метод, если вставка должна ещё обновлять связанные агрегаты.
+        """
+        model = type(instances[0])
+        bulk_insert(model.objects, instances)
+        bump_on_commit(INVALIDATES[model], router.db_for_write(model))
+
+    def create(self, request, *args, **kwargs):
+        data = request.data
+        limit = settings.BULK_CREATE_MAX_SIZE
+        if not isinstance(data, list) or not 0 < len(data) <= limit:
+            raise ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [
+                    MESS_BULK_SIZE.format(limit)
+                ]
+            })
+        items = {
+            index: self.get_serializer(data=item)
+            for index, item in enumerate(data)
+        }
+        errors = {
+            index: item.errors
+            for index, item in items.items()
+            if not item.is_valid()
+        }
+        with transaction.atomic():
+            errors.update(self.check_batch({
+                index: item
+                for index, item in items.items()
+                if index not in errors
+            }))
+            created = {
+                index: item.Meta.model(
+                    **item.validated_data, author=request.user
+                )
+                for index, item in items.items()
+                if index not in errors
+            }
+            if created:
+                self.bulk_create(list(created.values()))
+        results = [
+            {'status': status.HTTP_400_BAD_REQUEST, 'errors': errors[index]}
+            if index in errors else
+            {
+                'status': status.HTTP_201_CREATED,
+                'data': self.get_serializer(created[index]).data,
+            }
+            for index in items
+        ]
+        return Response(
+            results,
+            status=status.HTTP_201_CREATED if created
+            else status.HTTP_400_BAD_REQUEST,
+        )
@@ -1,11 +1,189 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+from functools import partial
+from math import ceil
+
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 from rest_framework.response import Response
 
+from .cache import get_cache, get_version
+
+COUNT_KEY = 'catalog:count:{}:{}:{}'
+MESS_NOT_INTEGER = 'Номер страницы должен быть целым числом'
+MESS_LESS_THAN_ONE = 'Номер страницы меньше 1'
+MESS_NO_RESULTS = 'На этой странице нет результатов'
+
+
+def exact_count(object_list, view):
+    if isinstance(object_list, QuerySet):
+        return object_list.count(), True
+    return len(object_list), True
+
+
+def cached_count(object_list, view):
+    """Точное число строк из кэша до изменения ``count_resource``."""
+    if not isinstance(object_list, QuerySet):
+        return exact_count(object_list, view)
+    resource = view.count_resource
+    # Ключ зависит только от условий выборки, не от колонок и порядка.
+    try:
+        sql, params = object_list.order_by().values(
+            'pk'
+        ).query.sql_with_params()
+    except EmptyResultSet:
+        return 0, True
+    variant = hashlib.md5(f'{sql}:{params}'.encode()).hexdigest()
+    key = COUNT_KEY.format(resource, get_version(resource), variant)
+    cache = get_cache()
+    count = cache.get(key)
+    if count is None:
+        count = object_list.count()
+        cache.set(key, count, settings.CATALOG_CACHE_TIMEOUT)
+    return count, True
+
+
+def estimated_count(object_list, view):
+    """Оценка планировщика PostgreSQL, точный COUNT для малых выборок."""
+    if not isinstance(object_list, QuerySet):
+        return exact_count(object_list, view)
+    connection = connections[object_list.db]
+    if connection.vendor != 'postgresql':
+        return exact_count(object_list, view)
+    try:
+        sql, params = object_list.query.sql_with_params()
+    except EmptyResultSet:
+        return 0, True
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        estimate = cursor.fetchone()[0][0]['Plan']['Plan Rows']
+    if estimate < settings.PAGINATION_ESTIMATE_THRESHOLD:
+        return exact_count(object_list, view)
+    return estimate, False
+
+
+def no_count(object_list, view):
+    return None, False
+
+
+COUNTERS = {
+    'exact': exact_count,
+    'cached': cached_count,
+    'estimate': estimated_count,
+    'none': no_count,
+}
+
+
+class CountingPaginator(Paginator):
+    """Paginator со сменным способом подсчёта строк.
+
+    ``counter`` возвращает число строк и признак его точности. Если
+    число неточное или его нет, страница выбирается с одной лишней
+    строкой, по которой видно, есть ли следующая.
+    """
+
+    def __init__(self, object_list, per_page, counter, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.counter = counter
+        self.known_pages = 1
+
+    @cached_property
+    def counted(self):
+        return self.counter(self.object_list)
+
+    @property
+    def count(self):
+        return self.counted[0]
+
+    @property
+    def exact(self):
+        return self.counted[1]
+
+    @property
+    def num_pages(self):
+        if not self.exact:
+            return self.known_pages
+        if self.count == 0 and not self.allow_empty_first_page:
+            return 0
+        return ceil(max(1, self.count - self.orphans) / self.per_page)
+
+    def validate_number(self, number):
+        if self.exact:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(MESS_NOT_INTEGER)
+        if number < 1:
+            raise EmptyPage(MESS_LESS_THAN_ONE)
+        return number
+
+    def page(self, number):
+        if self.exact:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage(MESS_NO_RESULTS)
+        self.known_pages = number + (len(rows) > self.per_page)
+        return self._get_page(rows[:self.per_page], number, self)
+
 
 class CustomUserPagination(PageNumberPagination):
+    """Номера страниц с подсчётом по ``count_mode`` представления.
+
+    ``exact`` — COUNT на каждый запрос, ``cached`` — точное число из кэша
+    до изменения ``count_resource``, ``estimate`` — оценка планировщика
+    для выборок больше ``PAGINATION_ESTIMATE_THRESHOLD``, ``none`` — без
+    подсчёта, ``count`` равен null.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        counter = COUNTERS[getattr(view, 'count_mode', 'exact')]
+        self.django_paginator_class = partial(
+            CountingPaginator, counter=partial(counter, view=view)
+        )
+        return super().paginate_queryset(queryset, request, view)
+
     def get_paginated_response(self, data):
         return Response({
             'count': self.page.paginator.count,
             'next': self.get_next_link(),
             'previous': self.get_previous_link(),
             'results': data})
+
+
+class PubDateCursorPagination(CursorPagination):
+    """Постраничный вывод по ключу (pub_date, id) без COUNT и OFFSET."""
+    ordering = ('-pub_date', '-id')
+
+    def decode_cursor(self, request):
+        if not request.query_params.get(self.cursor_query_param):
+            return None
+        return super().decode_cursor(request)
+
+
+class PageOrCursorPagination(CustomUserPagination):
+    """Номера страниц по умолчанию, курсор при наличии параметра ``cursor``.
+
+    Первая страница в режиме курсора запрашивается с пустым ``?cursor=``,
+    дальше клиент переходит по ссылкам ``next``/``previous``.
+    """
+    cursor_class = PubDateCursorPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor = None
+        if self.cursor_class.cursor_query_param in request.query_params:
+            self.cursor = self.cursor_class()
+            return self.cursor.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor is not None:
+            return self.cursor.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,67 @@
+import re
+from io import BytesIO
+
+import orjson
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+UTF8 = ('utf-8', 'utf8')
+EXPONENT = re.compile(rb'[0-9]e-?[0-9]')
+
+
+class FastJSONRenderer(JSONRenderer):
+    """Компактный JSON через orjson, побайтно совпадающий с JSONRenderer.
+
+    Отступы и ``ensure_ascii`` orjson не поддерживает, в этих случаях
+    работает обычный рендерер. Он же рендерит данные, которые orjson не
+    кодирует (целые шире 64 бит), и ответы с экспонентой в числах:
+    orjson пишет ``1e20``, а json - ``1e+20``. Экспонента ищется по
+    байтам, поэтому похожий текст в строках тоже уводит на медленный
+    путь, но вывод остаётся прежним.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=ORJSON_OPTIONS,
+            )
+        except TypeError:
+            ret = None
+        if ret is None or EXPONENT.search(ret):
+            return super().render(data, accepted_media_type, renderer_context)
+        # Как и JSONRenderer, экранируем разделители строк для JavaScript.
+        return ret.replace(
+            b'\xe2\x80\xa8', b'\\u2028'
+        ).replace(
+            b'\xe2\x80\xa9', b'\\u2029'
+        )
+
+
+class FastJSONParser(JSONParser):
+    """Разбор JSON через orjson с поведением JSONParser.
+
+    Тело, которое orjson не принял, разбирается повторно обычным
+    парсером: он либо примет то, что orjson не поддерживает (``NaN``
+    без ``STRICT_JSON``), либо вернёт ошибку с тем же текстом, что и
+    без orjson.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if encoding.lower() not in UTF8:
+            return super().parse(stream, media_type, parser_context)
+        body = stream.read()
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            return super().parse(BytesIO(body), media_type, parser_context)
@@ -1,14 +1,183 @@
+from collections import OrderedDict
+from copy import deepcopy
+from operator import attrgetter, itemgetter
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Manager
 from django.shortcuts import get_object_or_404
+from django.utils.encoding import smart_str
+from django.utils.functional import cached_property
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+from rest_framework.settings import api_settings
 from rest_framework.validators import ValidationError
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from reviews.models import Category, Comment, Genre, Review, Title
+from reviews.models import (HISTOGRAM_FIELDS, Category, Comment, Genre,
+                            Review, Title)
+from users.authentication import add_user_claims
 from users.models import User
+from .snapshot import lookup
 
 MESS_VAL_LOG = 'Поле {} отсутствует или оно некорректно'
 SINGLE_REVIEW = 'Можно оставить только один отзыв'
+PLAIN_FIELDS = (serializers.CharField, serializers.IntegerField)
+
+
+def make_accessor(field):
+    """Функция, возвращающая представление поля для объекта модели."""
+    if field.source == '*':
+        return field.to_representation
+    get = attrgetter(field.source)
+    if isinstance(field, serializers.ListSerializer):
+        child = field.child
+
+        def convert(value):
+            if isinstance(value, Manager):
+                value = value.all()
+            return [child.to_representation(item) for item in value]
+    elif isinstance(field, serializers.ManyRelatedField):
+        def convert(value):
+            return field.to_representation(value.all())
+    elif isinstance(field, PLAIN_FIELDS):
+        return get
+    elif isinstance(field, serializers.SlugRelatedField):
+        convert = attrgetter(field.slug_field)
+    else:
+        convert = field.to_representation
+
+    def accessor(instance):
+        value = get(instance)
+        return None if value is None else convert(value)
+    return accessor
+
+
+class FastReadMixin:
+    """Чтение без общего механизма полей DRF для каждого объекта.
+
+    Функции доступа к полям собираются один раз на сериализатор, вывод
+    совпадает с ``Serializer.to_representation``.
+    """
+
+    @cached_property
+    def accessors(self):
+        return [
+            (field.field_name, make_accessor(field))
+            for field in self._readable_fields
+        ]
+
+    def to_representation(self, instance):
+        return OrderedDict(
+            (name, accessor(instance)) for name, accessor in self.accessors
+        )
+
+
+class SparseFieldsSerializerMixin:
+    """Оставляет поля из ``context['fields']`` и разворачивает связи.
+
+    Связь из ``context['expand']`` берётся из ``expanded_fields``,
+    остальные связи — из ``collapsed_fields``; на месте остаются
+    объявленные поля. Поле из ``expanded_fields``, которого нет среди
+    объявленных, добавляется в конец только по запросу.
+    """
+    expanded_fields = {}
+    collapsed_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.context.get('fields')
+        expand = self.context.get('expand')
+        if requested is not None:
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+        if expand is None:
+            return
+        for name, field in self.expanded_fields.items():
+            if name in expand and (requested is None or name in requested):
+                self.fields[name] = deepcopy(field)
+        for name, field in self.collapsed_fields.items():
+            if name in self.fields and name not in expand:
+                self.fields[name] = deepcopy(field)
+
+
+class ManySlugRelatedField(serializers.ManyRelatedField):
+    """Список слагов, проверенный одним запросом к базе."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        child = self.child_relation
+        slugs = [smart_str(item) for item in data]
+        found = {
+            getattr(instance, child.slug_field): instance
+            for instance in child.get_queryset().filter(
+                **{f'{child.slug_field}__in': slugs}
+            )
+        }
+        for slug in slugs:
+            if slug not in found:
+                child.fail(
+                    'does_not_exist', slug_name=child.slug_field, value=slug
+                )
+        return [found[slug] for slug in slugs]
+
+
+class BatchSlugRelatedField(serializers.SlugRelatedField):
+    """Слаг связанного объекта; список слагов проверяется одним запросом.
+
+    Запись сверяется с базой, а не со снимком каталога: в снимке другого
+    воркера может остаться уже удалённый слаг.
+    """
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return ManySlugRelatedField(**list_kwargs)
+
+
+class SnapshotRelatedField(serializers.Field):
+    """Жанр или категория по id из снимка каталога, без JOIN.
+
+    С ``expand=False`` выводится только слаг.
+    """
+
+    def __init__(self, table, expand=True, **kwargs):
+        self.table = table
+        self.expand = expand
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def describe(self, record):
+        _, _, slug, name = record
+        if not self.expand:
+            return slug
+        return OrderedDict((('name', name), ('slug', slug)))
+
+    def to_representation(self, value):
+        record = lookup(self.table, value)
+        return None if record is None else self.describe(record)
+
+
+class SnapshotLinksField(SnapshotRelatedField):
+    """Жанры по строкам ``GenreTitle`` в порядке сортировки модели."""
+
+    def to_representation(self, links):
+        attribute = '{}_id'.format(self.table)
+        records = [
+            lookup(self.table, getattr(link, attribute))
+            for link in links.all()
+        ]
+        return [
+            self.describe(record)
+            for record in sorted(filter(None, records), key=itemgetter(1, 3))
+        ]
 
 
 class AuthenticationSerializer(serializers.ModelSerializer):
@@ -50,8 +219,9 @@ class LoginSerializer(TokenObtainPairSerializer):
 
     def get_tokens_for_user(self, user):
         refresh = RefreshToken.for_user(user)
+        access = add_user_claims(refresh.access_token, user)
         return {
-            'token': str(refresh.access_token)}
+            'token': str(access)}
 
     def validate(self, data):
         user = get_object_or_404(User, username=data['username'])
@@ -60,14 +230,14 @@ class LoginSerializer(TokenObtainPairSerializer):
         return self.get_tokens_for_user(user)
 
 
-class GenreSerializer(serializers.ModelSerializer):
+class GenreSerializer(FastReadMixin, serializers.ModelSerializer):
     class Meta:
         model = Genre
         fields = ('name', 'slug')
         lookup_field = 'slug'
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(FastReadMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ('name', 'slug')
@@ -76,59 +246,140 @@ class CategorySerializer(serializers.ModelSerializer):
 
 class TitleSerializer(serializers.ModelSerializer):
     category = serializers.SlugRelatedField(
-        queryset=Category.objects.all(),
-        slug_field='slug',
+        slug_field='slug', queryset=Category.objects.all()
     )
-    genre = serializers.SlugRelatedField(
-        queryset=Genre.objects.all(),
-        slug_field='slug',
-        many=True,
+    genre = BatchSlugRelatedField(
+        slug_field='slug', queryset=Genre.objects.all(), many=True
     )
     rating = serializers.FloatField(read_only=True)
 
     class Meta:
         model = Title
-        fields = '__all__'
+        exclude = ('score_sum', 'review_count', *HISTOGRAM_FIELDS)
+
+
+class AuthorSerializer(FastReadMixin, serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ('username', 'first_name', 'last_name', 'bio')
 
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(SparseFieldsSerializerMixin,
+                       FastReadMixin,
+                       serializers.ModelSerializer):
     author = serializers.SlugRelatedField(
         read_only=True, slug_field='username'
     )
+    expanded_fields = {'author': AuthorSerializer(read_only=True)}
 
     class Meta:
-        exclude = ('title',)
+        exclude = ('title', 'updated_at')
         read_only_fields = ('id', 'author', 'pub_date')
         model = Review
 
-    def validate(self, data):
-        if self.context['request'].method != 'POST':
-            return data
-        title = self.context['view'].kwargs.get('title_id')
-        author = self.context['request'].user
-        if author.reviews.filter(title=title).exists():
-            raise serializers.ValidationError(SINGLE_REVIEW)
-        return data
+    def create(self, validated_data):
+        # Единственность отзыва проверяет ограничение one_review. Точка
+        # сохранения откатывает только эту вставку, и внешняя транзакция
+        # остаётся пригодной.
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError:
+            # Прочие нарушения целостности - не ошибка клиента.
+            if not Review.objects.filter(
+                title_id=validated_data['title_id'],
+                author=validated_data['author'],
+            ).exists():
+                raise
+            raise serializers.ValidationError(
+                {api_settings.NON_FIELD_ERRORS_KEY: [SINGLE_REVIEW]}
+            )
+
+    def update(self, instance, validated_data):
+        for name, value in validated_data.items():
+            setattr(instance, name, value)
+        instance.save(update_fields=[*validated_data, 'updated_at'])
+        return instance
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(SparseFieldsSerializerMixin,
+                        FastReadMixin,
+                        serializers.ModelSerializer):
     author = serializers.SlugRelatedField(
         read_only=True, slug_field='username'
     )
+    expanded_fields = {'author': AuthorSerializer(read_only=True)}
 
     class Meta:
         model = Comment
-        exclude = ('review',)
+        exclude = ('review', 'updated_at')
         read_only_fields = ('id', 'pub_date')
 
 
-class ReadOnlyTitleSerializer(serializers.ModelSerializer):
-    rating = serializers.IntegerField(
-        source='reviews__score__avg', read_only=True
-    )
-    genre = GenreSerializer(many=True)
-    category = CategorySerializer()
+class BulkReviewSerializer(ReviewSerializer):
+    """Элемент пакета отзывов; произведение задаётся id в ``title``."""
+    title = serializers.IntegerField(source='title_id', min_value=1)
+
+    class Meta:
+        model = Review
+        fields = ('id', 'title', 'author', 'text', 'score', 'pub_date')
+        read_only_fields = ('id', 'author', 'pub_date')
+
+
+class BulkCommentSerializer(CommentSerializer):
+    """Элемент пакета комментариев; отзыв задаётся id в ``review``."""
+    review = serializers.IntegerField(source='review_id', min_value=1)
+
+    class Meta:
+        model = Comment
+        fields = ('id', 'review', 'author', 'text', 'pub_date')
+        read_only_fields = ('id', 'pub_date')
+
+
+class TitleStatsSerializer(FastReadMixin, serializers.ModelSerializer):
+    """Статистика оценок из сохранённой гистограммы, без чтения отзывов.
+
+    Для байесовского рейтинга среднее по каталогу берётся из
+    ``context['rating_prior']``.
+    """
+    histogram = serializers.DictField(read_only=True)
+    mean = serializers.FloatField(source='rating', read_only=True)
+    median = serializers.FloatField(source='median_score', read_only=True)
+    bayesian_rating = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Title
+        fields = (
+            'review_count',
+            'histogram',
+            'mean',
+            'median',
+            'bayesian_rating',
+        )
+
+    def get_bayesian_rating(self, title):
+        return title.bayesian_rating(
+            self.context.get('rating_prior'), settings.RATING_PRIOR_WEIGHT
+        )
+
+
+class ReadOnlyTitleSerializer(SparseFieldsSerializerMixin,
+                              FastReadMixin,
+                              serializers.ModelSerializer):
+    genre = SnapshotLinksField('genre', source='genretitle_set')
+    category = SnapshotRelatedField('category', source='category_id')
     rating = serializers.FloatField(read_only=True)
+    collapsed_fields = {
+        'genre': SnapshotLinksField(
+            'genre', expand=False, source='genretitle_set'
+        ),
+        'category': SnapshotRelatedField(
+            'category', expand=False, source='category_id'
+        ),
+    }
+    expanded_fields = {
+        'stats': TitleStatsSerializer(source='*', read_only=True),
+    }
 
     class Meta:
         model = Title
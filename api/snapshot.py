@@ -0,0 +1,240 @@
+"""Снимок справочников жанров и категорий в файле, общем для процессов.
+
+Файл отображается в память (``mmap``) всеми воркерами хоста, поиск по
+слагу и по id идёт двоичным поиском прямо по отображению, без разбора
+файла в словари. После изменения жанра или категории процесс, который
+его сохранил, записывает новый файл рядом и атомарно подменяет старый;
+остальные замечают подмену по ``stat`` не реже раза в
+``CATALOG_SNAPSHOT_CHECK_INTERVAL`` секунд. Слаг, которого нет в
+снимке, ищется в базе.
+
+Формат (little-endian): заголовок ``FILE_HEADER`` со смещениями таблиц;
+таблица - число записей, смещения записей в порядке слагов, смещения в
+порядке id и сами записи ``RECORD`` со слагом и названием в UTF-8.
+``rank`` - место записи в сортировке модели, по нему вложенные жанры
+выводятся в том же порядке, что и из базы.
+"""
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models.signals import post_delete, post_save
+
+from reviews.models import Category, Genre
+
+MAGIC = b'YCAT'
+FORMAT = 1
+FILE_HEADER = struct.Struct('<4sHQII')
+COUNT = struct.Struct('<I')
+OFFSET = struct.Struct('<I')
+RECORD = struct.Struct('<IIHH')
+MODELS = {'genre': Genre, 'category': Category}
+TABLES = tuple(MODELS)
+FIELDS = ('id', 'slug', 'name')
+UNRANKED = 2 ** 32
+
+
+def pack(tables, generation):
+    """Собирает содержимое файла из ``{table: [(id, slug, name), ...]}``."""
+    body = bytearray()
+    table_offsets = []
+    for table in TABLES:
+        rows = tables[table]
+        start = FILE_HEADER.size + len(body)
+        table_offsets.append(start)
+        records_start = start + COUNT.size + 2 * OFFSET.size * len(rows)
+        records = bytearray()
+        offsets = {}
+        for rank, (pk, slug, name) in enumerate(rows):
+            offsets[pk] = records_start + len(records)
+            slug, name = slug.encode(), name.encode()
+            records += RECORD.pack(pk, rank, len(slug), len(name))
+            records += slug + name
+        body += COUNT.pack(len(rows))
+        for pk, _, _ in sorted(rows, key=lambda row: row[1].encode()):
+            body += OFFSET.pack(offsets[pk])
+        for pk in sorted(offsets):
+            body += OFFSET.pack(offsets[pk])
+        body += records
+    return FILE_HEADER.pack(MAGIC, FORMAT, generation, *table_offsets) + body
+
+
+class Snapshot:
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            stat = os.fstat(file.fileno())
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        magic, version, self.generation, *offsets = FILE_HEADER.unpack_from(
+            self.buffer
+        )
+        if magic != MAGIC or version != FORMAT:
+            raise ValueError(path)
+        self.tables = dict(zip(TABLES, offsets))
+
+    def index(self, table, by_id):
+        start = self.tables[table]
+        count, = COUNT.unpack_from(self.buffer, start)
+        base = start + COUNT.size + (OFFSET.size * count if by_id else 0)
+        return base, count
+
+    def record(self, offset):
+        pk, rank, slug_length, name_length = RECORD.unpack_from(
+            self.buffer, offset
+        )
+        slug_start = offset + RECORD.size
+        name_start = slug_start + slug_length
+        return (
+            pk,
+            rank,
+            self.buffer[slug_start:name_start].decode(),
+            self.buffer[name_start:name_start + name_length].decode(),
+        )
+
+    def search(self, table, by_id, key):
+        base, count = self.index(table, by_id)
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            offset, = OFFSET.unpack_from(
+                self.buffer, base + OFFSET.size * middle
+            )
+            if by_id:
+                current, = struct.unpack_from('<I', self.buffer, offset)
+            else:
+                _, _, length, _ = RECORD.unpack_from(self.buffer, offset)
+                start = offset + RECORD.size
+                current = self.buffer[start:start + length]
+            if current == key:
+                return self.record(offset)
+            if current < key:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def by_slug(self, table, slug):
+        return self.search(table, False, slug.encode())
+
+    def by_id(self, table, pk):
+        return self.search(table, True, pk)
+
+
+lock = threading.Lock()
+current = None
+checked_at = 0
+
+
+def get_path():
+    """Файл снимка своей базы: тестовая база не увидит снимок рабочей."""
+    database = connections[DEFAULT_DB_ALIAS].settings_dict
+    key = [database[name] for name in ('ENGINE', 'NAME', 'HOST', 'PORT')]
+    if database['NAME'] in ('', ':memory:'):
+        key.append(os.getpid())
+    return os.path.join(
+        settings.CATALOG_SNAPSHOT_DIR,
+        'yamdb-catalog-{}.snapshot'.format(
+            hashlib.md5(repr(key).encode()).hexdigest()
+        ),
+    )
+
+
+def publish(using=DEFAULT_DB_ALIAS):
+    """Пишет новый снимок из базы и подменяет им файл."""
+    tables = {
+        table: list(model.objects.using(using).values_list(*FIELDS))
+        for table, model in MODELS.items()
+    }
+    path = get_path()
+    descriptor, temporary = tempfile.mkstemp(
+        dir=settings.CATALOG_SNAPSHOT_DIR
+    )
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(pack(tables, time.time_ns()))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    refresh(force=True)
+
+
+def refresh(force=False):
+    global current, checked_at
+    now = time.monotonic()
+    interval = settings.CATALOG_SNAPSHOT_CHECK_INTERVAL
+    if not force and now - checked_at < interval:
+        return current
+    with lock:
+        checked_at = now
+        path = get_path()
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            current = None
+            return None
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if current is None or current.identity != identity:
+            current = Snapshot(path)
+    return current
+
+
+def get_snapshot():
+    snapshot = refresh()
+    if snapshot is None:
+        publish()
+        snapshot = refresh(force=True)
+    return snapshot
+
+
+def lookup(table, pk):
+    """``(id, rank, slug, name)`` по id; чего нет в снимке - из базы.
+
+    Промах возможен, пока воркер не заметил новый файл; такие записи
+    идут после известных снимку.
+    """
+    record = get_snapshot().by_id(table, pk)
+    if record is not None:
+        return record
+    for pk, slug, name in MODELS[table].objects.filter(
+        pk=pk
+    ).values_list(*FIELDS):
+        return pk, UNRANKED, slug, name
+    return None
+
+
+def resolve_slugs(table, slugs):
+    """id по слагам; слаги, которых нет в снимке, ищутся в базе."""
+    snapshot = get_snapshot()
+    ids = []
+    missing = []
+    for slug in slugs:
+        record = snapshot.by_slug(table, slug)
+        if record is None:
+            missing.append(slug)
+        else:
+            ids.append(record[0])
+    if missing:
+        ids += MODELS[table].objects.filter(
+            slug__in=missing
+        ).values_list('id', flat=True)
+    return ids
+
+
+def catalog_changed(sender, using, **kwargs):
+    if not kwargs.get('raw'):
+        transaction.on_commit(lambda: publish(using), using=using)
+
+
+def connect_signals():
+    for model in MODELS.values():
+        post_save.connect(catalog_changed, sender=model)
+        post_delete.connect(catalog_changed, sender=model)
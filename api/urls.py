@@ -3,11 +3,14 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
 from .views import (AuthenticationViewSet,
+                    CommentBulkViewSet,
                     CommentViewSet,
+                    ReviewBulkViewSet,
                     ReviewViewSet,
                     admin_putch_get_delete_users,
                     user_putch_get_user,
                     CategoryViewSet,
+                    export_catalog,
                     GenreViewSet,
                     LoginView,
                     TitleViewSet,
@@ -26,6 +29,12 @@ router_v1.register('v1/titles', TitleViewSet, basename='Title')
 router_v1.register('v1/genres', GenreViewSet, basename='Genre')
 router_v1.register('v1/categories', CategoryViewSet, basename='Category')
 
+router_v1.register(
+    'v1/reviews/bulk', ReviewBulkViewSet, basename='reviews-bulk'
+)
+router_v1.register(
+    'v1/comments/bulk', CommentBulkViewSet, basename='comments-bulk'
+)
 router_v1.register(URL_VERSION + URL_REVIEW, ReviewViewSet, basename='reviews')
 router_v1.register(
     URL_VERSION + URL_COMMENT,
@@ -39,6 +48,7 @@ urlpatterns = [
         'v1/users/<slug:username>/',
         admin_putch_get_delete_users,
         name='username'),
+    path('v1/export/', export_catalog, name='export'),
     path('v1/auth/token/',
          LoginView.as_view(),
          name='token_obtain_pair'),
@@ -1,35 +1,60 @@
 from django.conf import settings
-from django.core.mail import send_mail
-from django.db.models import Avg
-from django.http import Http404
+from django.db import router, transaction
+from django.db.models import Prefetch
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.utils.crypto import get_random_string
+from django_filters import utils as filter_utils
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, permissions, status, viewsets
-from rest_framework.decorators import api_view
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework_simplejwt.views import TokenObtainPairView
 
-from reviews.models import Category, Genre, Review, Title
-from users.models import User
+from reviews.exporters import FORMATS, RESOURCES, export
+from reviews.models import (BOARD_CATEGORY, BOARD_GENRE, BOARD_TOP,
+                            BOARD_TRENDING, HISTOGRAM_FIELDS, Category,
+                            Comment, Genre, GenreTitle, Ranking, Review,
+                            Title)
+from reviews.journal import get_journal
+from users.models import OutgoingEmail, User
+from .cache import (INVALIDATES, CachedResponseMixin, bump_on_commit,
+                    get_rating_prior)
+from .facets import DIMENSIONS, faceted_search
 from .filters import TitlesFilter
-from .mixins import DestroyCreateListViewSet
-from .paginations import CustomUserPagination
+from .mixins import (AuthorQuerySetMixin, BulkCreateViewSet,
+                     DestroyCreateListViewSet, NestedParentMixin,
+                     ReplicaReadMixin, SparseFieldsMixin)
+from .paginations import CustomUserPagination, PageOrCursorPagination
 from .permisions import (AdminUrlUserPermission,
                          AuthorModeratorAdminOrReadOnly,
                          ReadOnly)
-from .serializers import (AuthenticationSerializer,
+from .serializers import (SINGLE_REVIEW,
+                          AuthenticationSerializer,
+                          BulkCommentSerializer,
+                          BulkReviewSerializer,
                           CategorySerializer,
                           CommentSerializer,
                           GenreSerializer,
                           LoginSerializer,
                           ReadOnlyTitleSerializer,
                           ReviewSerializer, TitleSerializer,
-                          UserSerializer)
+                          TitleStatsSerializer, UserSerializer)
+from .snapshot import resolve_slugs
 
 MESS_TOPIC_MAIL = 'Код подтверждения'
+MESS_IDS = 'Укажите от 1 до {} id произведений через запятую'
+MESS_TITLE_NOT_FOUND = 'Произведение не найдено'
+MESS_REVIEW_NOT_FOUND = 'Отзыв не найден'
 LEN_COD_CONF = 6
-NOT_FOUND = 'Запрошенного объекта не существует'
+EXPORT_CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
 
 
 class AuthenticationViewSet(viewsets.ModelViewSet):
@@ -50,6 +75,7 @@ class AuthenticationViewSet(viewsets.ModelViewSet):
                         status=status.HTTP_200_OK,
                         headers=headers)
 
+    @transaction.atomic
     def perform_create(self, serializer, email):
         confirmation_code = get_random_string(length=LEN_COD_CONF)
         serializer.save(
@@ -57,11 +83,11 @@ class AuthenticationViewSet(viewsets.ModelViewSet):
         self.send_message(confirmation_code, email)
 
     def send_message(self, confirmation_code, email):
-        send_mail(
-            MESS_TOPIC_MAIL,
-            confirmation_code,
-            settings.EMAIL_HOST_USER,
-            [email])
+        OutgoingEmail.objects.create(
+            subject=MESS_TOPIC_MAIL,
+            body=confirmation_code,
+            from_email=settings.EMAIL_HOST_USER,
+            to=email)
 
 
 class LoginView(TokenObtainPairView):
@@ -77,6 +103,8 @@ class UserViewSet(viewsets.ModelViewSet):
     search_fields = ('=username',)
     permission_classes = (AdminUrlUserPermission,)
     pagination_class = CustomUserPagination
+    count_mode = 'cached'
+    count_resource = 'users'
 
 
 @api_view(['GET', 'PATCH', 'DELETE', 'PUT'])
@@ -121,12 +149,39 @@ def user_putch_get_user(request):
     return Response(status=status.HTTP_401_UNAUTHORIZED)
 
 
-class GenreViewSet(DestroyCreateListViewSet):
+@api_view(['GET'])
+@permission_classes((AdminUrlUserPermission,))
+def export_catalog(request):
+    output = request.query_params.get('output', 'ndjson')
+    resources = request.query_params.get('resource', ','.join(RESOURCES))
+    resources = [item for item in resources.split(',') if item]
+    since = request.query_params.get('since')
+    if since is not None:
+        since = parse_datetime(since)
+    if (output not in FORMATS
+            or not resources
+            or set(resources) - set(RESOURCES)
+            or (output == 'csv' and len(resources) != 1)
+            or ('since' in request.query_params and since is None)):
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+    until = timezone.now()
+    response = StreamingHttpResponse(
+        export(output, resources, since, until),
+        content_type=EXPORT_CONTENT_TYPES[output],
+    )
+    response['X-Export-Watermark'] = until.isoformat()
+    return response
+
+
+class GenreViewSet(ReplicaReadMixin,
+                   CachedResponseMixin,
+                   DestroyCreateListViewSet):
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
     search_fields = ('name',)
     lookup_field = 'slug'
     filter_backends = (filters.SearchFilter,)
+    cache_resource = 'genres'
 
     def get_permissions(self):
         if self.request.user.is_anonymous:
@@ -137,12 +192,15 @@ class GenreViewSet(DestroyCreateListViewSet):
         return (ReadOnly(),)
 
 
-class CategoryViewSet(DestroyCreateListViewSet):
+class CategoryViewSet(ReplicaReadMixin,
+                      CachedResponseMixin,
+                      DestroyCreateListViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     search_fields = ('name',)
     lookup_field = 'slug'
     filter_backends = (filters.SearchFilter,)
+    cache_resource = 'categories'
 
     def get_permissions(self):
         if self.request.user.is_anonymous:
@@ -153,18 +211,154 @@ class CategoryViewSet(DestroyCreateListViewSet):
         return (ReadOnly(),)
 
 
-class TitleViewSet(viewsets.ModelViewSet):
-    queryset = Title.objects.annotate(rating=Avg('reviews__score'))
+class TitleViewSet(ReplicaReadMixin,
+                   CachedResponseMixin,
+                   SparseFieldsMixin,
+                   viewsets.ModelViewSet):
+    queryset = Title.objects.all()
     serializer_class = TitleSerializer
     filterset_class = TitlesFilter
     filter_backends = [DjangoFilterBackend]
     pagination_class = CustomUserPagination
+    cache_resource = 'titles'
+    count_mode = 'cached'
+    count_resource = 'titles'
+    default_expand = ('genre', 'category')
+    sparse_actions = ('list', 'retrieve', 'top', 'trending')
+    stats_fields = ('score_sum', 'review_count', 'rating', *HISTOGRAM_FIELDS)
+
+    def get_queryset(self):
+        if self.action == 'stats':
+            return Title.objects.only(*self.stats_fields)
+        queryset = super().get_queryset()
+        if self.is_requested('genre'):
+            # Жанры и категория выводятся из снимка каталога, из базы
+            # нужны только id.
+            queryset = queryset.prefetch_related(Prefetch(
+                'genretitle_set',
+                queryset=GenreTitle.objects.only('title', 'genre'),
+            ))
+        if self.requested_fields is not None:
+            columns = self.sparse_columns(
+                field.name for field in Title._meta.concrete_fields
+            )
+            if self.is_expanded('stats'):
+                columns += self.stats_fields
+            return queryset.only(*columns)
+        if (self.action in self.sparse_actions
+                and not self.is_expanded('stats')):
+            queryset = queryset.defer(*HISTOGRAM_FIELDS)
+        return queryset
 
     def get_serializer_class(self):
-        if self.action in ('retrieve', 'list'):
+        if self.action in self.sparse_actions:
             return ReadOnlyTitleSerializer
+        if self.action == 'stats':
+            return TitleStatsSerializer
         return TitleSerializer
 
+    def list(self, request, *args, **kwargs):
+        if 'ids' in request.query_params:
+            return self.cached_response(self.get_batch, request)
+        if 'facets' in request.query_params:
+            return self.cached_response(self.get_faceted_list, request)
+        return super().list(request, *args, **kwargs)
+
+    def get_batch(self, request):
+        """Произведения по ``?ids=1,2,3`` одним запросом, без пагинации.
+
+        Порядок ответа - порядок id в запросе, несуществующие id
+        пропускаются.
+        """
+        limit = settings.TITLE_BATCH_MAX_SIZE
+        try:
+            ids = [
+                int(pk) for pk in request.query_params['ids'].split(',') if pk
+            ]
+        except ValueError:
+            ids = []
+        if not 0 < len(ids) <= limit:
+            raise ValidationError({'ids': [MESS_IDS.format(limit)]})
+        titles = self.get_queryset().in_bulk(ids)
+        return Response(self.get_serializer(
+            [titles[pk] for pk in dict.fromkeys(ids) if pk in titles],
+            many=True,
+        ).data)
+
+    def get_faceted_list(self, request):
+        """Список со счётчиками ``?facets=genre,category,year``.
+
+        Фильтры по жанру, категории и году считаются по индексу в памяти,
+        пустое значение ``facets`` включает все измерения.
+        """
+        filterset = TitlesFilter(
+            request.query_params, queryset=Title.objects.all(),
+            request=request,
+        )
+        if not filterset.is_valid():
+            raise filter_utils.translate_validation(filterset.errors)
+        dimensions = [
+            dimension
+            for dimension in request.query_params['facets'].split(',')
+            if dimension in DIMENSIONS
+        ] or DIMENSIONS
+        ids, facets = faceted_search(filterset, dimensions)
+        page = self.paginate_queryset(ids)
+        titles = self.get_queryset().in_bulk(page)
+        response = self.get_paginated_response(self.get_serializer(
+            [titles[pk] for pk in page if pk in titles], many=True
+        ).data)
+        response.data['facets'] = facets
+        return response
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action == 'stats' or self.is_expanded('stats'):
+            context['rating_prior'] = get_rating_prior()
+        return context
+
+    @action(detail=True)
+    def stats(self, request, pk=None):
+        return self.cached_response(self.get_stats, request)
+
+    def get_stats(self, request):
+        return Response(self.get_serializer(self.get_object()).data)
+
+    @action(detail=False)
+    def top(self, request):
+        """Лучшие по рейтингу: все, ``?category=`` или ``?genre=``."""
+        board = BOARD_TOP
+        for table, template in (('category', BOARD_CATEGORY),
+                                ('genre', BOARD_GENRE)):
+            if table in request.query_params:
+                ids = resolve_slugs(table, [request.query_params[table]])
+                if not ids:
+                    raise Http404
+                board = template.format(ids[0])
+                break
+        return self.cached_response(self.get_leaderboard, request, board)
+
+    @action(detail=False)
+    def trending(self, request):
+        """Больше всего отзывов за последние ``TRENDING_WINDOW_HOURS``."""
+        return self.cached_response(
+            self.get_leaderboard, request, BOARD_TRENDING
+        )
+
+    def get_leaderboard(self, request, board):
+        try:
+            size = int(request.query_params['limit'])
+        except (KeyError, ValueError):
+            size = settings.LEADERBOARD_SIZE
+        size = min(max(size, 1), settings.LEADERBOARD_MAX_SIZE)
+        ids = list(Ranking.objects.board(board).order_by(
+            '-score', 'title_id'
+        ).values_list('title_id', flat=True)[:size])
+        titles = self.get_queryset().in_bulk(ids)
+        return Response(self.get_serializer(
+            [titles[pk] for pk in ids if pk in titles], many=True
+        ).data)
+
     def get_permissions(self):
         if self.request.user.is_anonymous:
             return (ReadOnly(),)
@@ -174,41 +368,174 @@ class TitleViewSet(viewsets.ModelViewSet):
         return (ReadOnly(),)
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(ReplicaReadMixin,
+                    NestedParentMixin,
+                    AuthorQuerySetMixin,
+                    viewsets.ModelViewSet):
     serializer_class = ReviewSerializer
     permission_classes = (AuthorModeratorAdminOrReadOnly,)
-    pagination_class = CustomUserPagination
+    pagination_class = PageOrCursorPagination
+    count_mode = 'cached'
+    count_resource = 'reviews'
+    only_fields = ('id', 'title', 'text', 'score', 'pub_date')
+    required_fields = ('id', 'title', 'pub_date')
+    parent_model = Title
+    parent_lookups = {'pk': 'title_id'}
+    locked_actions = ('update', 'partial_update', 'destroy')
 
     def get_queryset(self):
-        title_id = self.kwargs.get('title_id')
-        title = get_object_or_404(Title, pk=title_id)
-        return title.reviews.all()
+        if self.action in self.locked_actions:
+            # Отзыв ищется сразу с условием на произведение и блокируется
+            # до конца транзакции: агрегаты сдвигаются по его оценке.
+            return self.optimize_queryset(Review.objects.filter(
+                title_id=self.kwargs['title_id']
+            )).select_for_update(of=('self',))
+        return self.optimize_queryset(self.get_parent().reviews.all())
 
     def perform_create(self, serializer):
-        title_id = self.kwargs.get('title_id')
-        title = get_object_or_404(Title, pk=title_id)
-        serializer.save(author=self.request.user, title=title)
-
-
-class CommentViewSet(viewsets.ModelViewSet):
+        # Произведение не читается: его наличие проверяет UPDATE агрегатов
+        # в Review.save.
+        try:
+            serializer.save(
+                author=self.request.user, title_id=self.kwargs['title_id']
+            )
+        except Title.DoesNotExist:
+            raise Http404
+
+    @transaction.atomic
+    def update(self, request, *args, **kwargs):
+        return super().update(request, *args, **kwargs)
+
+    @transaction.atomic
+    def destroy(self, request, *args, **kwargs):
+        return super().destroy(request, *args, **kwargs)
+
+
+class CommentViewSet(ReplicaReadMixin,
+                     NestedParentMixin,
+                     AuthorQuerySetMixin,
+                     viewsets.ModelViewSet):
     serializer_class = CommentSerializer
     permission_classes = (AuthorModeratorAdminOrReadOnly,)
-    pagination_class = CustomUserPagination
+    pagination_class = PageOrCursorPagination
+    count_mode = 'cached'
+    count_resource = 'comments'
+    only_fields = ('id', 'review', 'text', 'pub_date')
+    required_fields = ('id', 'review', 'pub_date')
+    parent_model = Review
+    parent_lookups = {'pk': 'review_id', 'title_id': 'title_id'}
 
     def get_queryset(self):
-        title_id = self.kwargs.get('title_id')
-        review_id = self.kwargs.get('review_id')
-        title = get_object_or_404(Title, pk=title_id)
-        review = get_object_or_404(Review, pk=review_id)
-        if review in title.reviews.all():
-            return review.comments.all()
-        raise Http404(NOT_FOUND)
+        return self.optimize_queryset(self.get_parent().comments.all())
 
     def perform_create(self, serializer):
-        title_id = self.kwargs.get('title_id')
-        review_id = self.kwargs.get('review_id')
-        title = get_object_or_404(Title, pk=title_id)
-        review = get_object_or_404(Review, pk=review_id)
-        if review not in title.reviews.all():
-            raise Http404(NOT_FOUND)
-        serializer.save(author=self.request.user, review=review)
+        serializer.save(author=self.request.user, review=self.get_parent())
+
+    def create(self, request, *args, **kwargs):
+        """С ``COMMENT_WRITE_BEHIND`` комментарий пишется в журнал, 202.
+
+        В базу его переносит ``flush_comments``; при переполненном
+        журнале комментарий сохраняется сразу.
+        """
+        if not settings.COMMENT_WRITE_BEHIND:
+            return super().create(request, *args, **kwargs)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        comment = Comment(
+            review=self.get_parent(),
+            author=request.user,
+            pub_date=timezone.now(),
+            **serializer.validated_data,
+        )
+        code = status.HTTP_202_ACCEPTED
+        if not get_journal().append(
+            comment, settings.COMMENT_JOURNAL_MAX_SIZE
+        ):
+            comment.save()
+            code = status.HTTP_201_CREATED
+        return Response(self.get_serializer(comment).data, status=code)
+
+    def list(self, request, *args, **kwargs):
+        # Автор сразу видит свои комментарии, ещё не перенесённые из
+        # журнала: они новее остальных и идут в начале первой страницы.
+        response = super().list(request, *args, **kwargs)
+        if not (settings.COMMENT_WRITE_BEHIND
+                and request.user.is_authenticated
+                and self.is_first_page(request)):
+            return response
+        pending = get_journal().pending_for(
+            int(self.kwargs['review_id']), request.user.id
+        )
+        if pending:
+            # В request.user - данные из токена, а не объект модели.
+            author = User.objects.get(pk=request.user.id)
+            for comment in pending:
+                comment.author = author
+            response.data['results'][:0] = self.get_serializer(
+                pending, many=True
+            ).data
+            if 'count' in response.data:
+                response.data['count'] += len(pending)
+        return response
+
+    def is_first_page(self, request):
+        cursor = request.query_params.get(
+            self.paginator.cursor_class.cursor_query_param
+        )
+        if cursor is not None:
+            return not cursor
+        page = request.query_params.get(self.paginator.page_query_param)
+        return page in (None, '1')
+
+
+class ReviewBulkViewSet(BulkCreateViewSet):
+    """``POST /reviews/bulk/``: отзывы текущего пользователя пакетом."""
+    serializer_class = BulkReviewSerializer
+
+    def check_batch(self, items):
+        # Блокировка строк произведений упорядочивает пакет с одиночными
+        # отзывами, которые блокируют их тем же UPDATE агрегатов.
+        title_ids = {
+            item.validated_data['title_id'] for item in items.values()
+        }
+        found = set(Title.objects.select_for_update().filter(
+            pk__in=title_ids
+        ).order_by('pk').values_list('pk', flat=True))
+        reviewed = set(self.request.user.reviews.filter(
+            title_id__in=found
+        ).values_list('title_id', flat=True))
+        errors = {}
+        for index, item in items.items():
+            title_id = item.validated_data['title_id']
+            if title_id not in found:
+                errors[index] = {'title': [MESS_TITLE_NOT_FOUND]}
+            elif title_id in reviewed:
+                errors[index] = {
+                    api_settings.NON_FIELD_ERRORS_KEY: [SINGLE_REVIEW]
+                }
+            else:
+                reviewed.add(title_id)
+        return errors
+
+    def bulk_create(self, instances):
+        # Вставка вместе со сдвигом агрегатов и рейтингов произведений.
+        Review.objects.bulk_add(instances)
+        bump_on_commit(INVALIDATES[Review], router.db_for_write(Review))
+
+
+class CommentBulkViewSet(BulkCreateViewSet):
+    """``POST /comments/bulk/``: комментарии к разным отзывам пакетом."""
+    serializer_class = BulkCommentSerializer
+
+    def check_batch(self, items):
+        review_ids = {
+            item.validated_data['review_id'] for item in items.values()
+        }
+        found = set(Review.objects.select_for_update().filter(
+            pk__in=review_ids
+        ).order_by('pk').values_list('pk', flat=True))
+        return {
+            index: {'review': [MESS_REVIEW_NOT_FOUND]}
+            for index, item in items.items()
+            if item.validated_data['review_id'] not in found
+        }
@@ -0,0 +1,107 @@
+import asyncio
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.handlers import asgi
+from django.db import close_old_connections
+
+READ_METHODS = ('GET', 'HEAD')
+STREAM_QUEUE_SIZE = 8
+
+
+class ASGIHandler(asgi.ASGIHandler):
+    """ASGI-обработчик с отдельным пулом потоков для чтения каталога.
+
+    В Django 3.0 нет асинхронных представлений и ORM, поэтому запросы к
+    базе выполняются в ограниченном пуле потоков, а медленные клиенты
+    обслуживает цикл событий и рабочий поток им не занимают. Потоковые
+    ответы генерируются в своём пуле и передаются через ограниченную
+    очередь: генератор ждёт медленного клиента и не должен занимать
+    потоки чтения.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.read_path = re.compile(settings.ASGI_READ_PATHS)
+        self.read_executor = ThreadPoolExecutor(
+            max_workers=settings.ASGI_READ_THREADS,
+            thread_name_prefix='yamdb-read',
+        )
+        self.stream_executor = ThreadPoolExecutor(
+            max_workers=settings.ASGI_STREAM_THREADS,
+            thread_name_prefix='yamdb-stream',
+        )
+
+    def get_executor(self, request):
+        if (request.method in READ_METHODS
+                and self.read_path.match(request.path_info)):
+            return self.read_executor
+        return None
+
+    async def get_response(self, request):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            self.get_executor(request), self.get_response_sync, request
+        )
+
+    def get_response_sync(self, request):
+        response = super().get_response(request)
+        if not response.streaming:
+            close_old_connections()
+        return response
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+        headers = [
+            (header.encode('ascii'), value.encode('latin1'))
+            for header, value in response.items()
+        ]
+        headers.extend(
+            (b'Set-Cookie', cookie.output(header='').encode('ascii').strip())
+            for cookie in response.cookies.values()
+        )
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': headers,
+        })
+        loop = asyncio.get_event_loop()
+        queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        stopped = threading.Event()
+
+        def put(item):
+            asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+        def produce():
+            try:
+                for part in response:
+                    if stopped.is_set():
+                        break
+                    put(part)
+            finally:
+                close_old_connections()
+                put(None)
+
+        producer = loop.run_in_executor(self.stream_executor, produce)
+        part = True
+        try:
+            while True:
+                part = await queue.get()
+                if part is None:
+                    break
+                for chunk, _ in self.chunk_bytes(part):
+                    await send({
+                        'type': 'http.response.body',
+                        'body': chunk,
+                        'more_body': True,
+                    })
+            await send({'type': 'http.response.body'})
+        finally:
+            stopped.set()
+            while part is not None:
+                part = await queue.get()
+            await producer
+            await loop.run_in_executor(self.stream_executor, response.close)
@@ -0,0 +1,332 @@
+"""Метрики запросов в текстовом формате Prometheus.
+
+Каждый процесс копит значения в памяти и периодически сбрасывает их в
+``METRICS_DIR/worker-<pid>-<start>.json``, где ``start`` - время запуска
+процесса: новый процесс с тем же pid пишет в свой файл и не затирает
+чужие счётчики. Эндпоинт ``/metrics`` суммирует файлы всех воркеров.
+Итоги завершившихся процессов (свои при выходе, чужие - когда процесса
+уже нет) переносятся в ``aggregate.json``, чтобы счётчики не убывали, а
+файлы воркеров удаляются. Без ``METRICS_DIR`` отдаются метрики текущего
+процесса.
+"""
+import atexit
+import fcntl
+import glob
+import json
+import os
+import random
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+HISTOGRAMS = {
+    'yamdb_http_request_duration_seconds': 'Время обработки запроса',
+}
+COUNTERS = {
+    'yamdb_http_response_size_bytes_total': 'Суммарный размер ответов',
+    'yamdb_db_queries_total': 'Число SQL-запросов',
+    'yamdb_db_query_duration_seconds_total': 'Время выполнения SQL',
+}
+WORKER_FILE = 'worker-{}-{}.json'
+AGGREGATE_FILE = 'aggregate.json'
+LOCK_FILE = 'aggregate.lock'
+
+
+def process_start(pid):
+    """Время запуска процесса из ``/proc``; ``None``, если его нет.
+
+    Без ``/proc`` процесс считается живым, пока есть его pid.
+    """
+    try:
+        with open(f'/proc/{pid}/stat') as source:
+            # Поля после имени процесса; starttime - 22-е поле stat.
+            return source.read().rsplit(')', 1)[1].split()[19]
+    except FileNotFoundError:
+        if os.path.isdir('/proc'):
+            return None
+    except (OSError, IndexError):
+        return None
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return None
+    except PermissionError:
+        pass
+    return ''
+
+
+def merge(total, data):
+    for key, value in data['counters'].items():
+        total['counters'][key] = total['counters'].get(key, 0) + value
+    for key, value in data['histograms'].items():
+        buckets = total['histograms'].setdefault(key, [0] * len(value))
+        for index, item in enumerate(value):
+            buckets[index] += item
+
+
+def read(path):
+    try:
+        with open(path) as source:
+            return json.load(source)
+    except (OSError, ValueError):
+        return None
+
+
+def write(path, data):
+    with open(path + '.tmp', 'w') as target:
+        json.dump(data, target)
+    os.replace(path + '.tmp', path)
+
+
+def is_alive(path):
+    pid, start = os.path.basename(path)[:-len('.json')].split('-')[1:]
+    return process_start(int(pid)) in (start, '')
+
+
+@contextmanager
+def locked(directory):
+    """Блокировка общего итога между процессами."""
+    with open(os.path.join(directory, LOCK_FILE), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def fold(directory, paths):
+    """Переносит файлы завершившихся процессов в общий итог и удаляет их.
+
+    Вызывается под ``locked``. Перенесённые имена хранятся в итоге,
+    поэтому сбой между записью итога и удалением файлов не учтёт их
+    дважды.
+    """
+    path = os.path.join(directory, AGGREGATE_FILE)
+    aggregate = read(path) or {
+        'counters': {}, 'histograms': {}, 'folded': [],
+    }
+    folded = set(aggregate['folded'])
+    for worker in paths:
+        name = os.path.basename(worker)
+        data = read(worker)
+        if name not in folded and data is not None:
+            merge(aggregate, data)
+            folded.add(name)
+    existing = {
+        os.path.basename(worker)
+        for worker in glob.glob(os.path.join(directory, 'worker-*.json'))
+    }
+    aggregate['folded'] = sorted(folded & existing)
+    write(path, aggregate)
+    for worker in paths:
+        try:
+            os.unlink(worker)
+        except FileNotFoundError:
+            pass
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.flushed_at = time.monotonic()
+        self.pid = None
+        self.start = None
+
+    def inc(self, name, labels, value):
+        key = json.dumps([name, labels])
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value, weight=1):
+        key = json.dumps([name, labels])
+        with self.lock:
+            buckets = self.histograms.setdefault(
+                key, [0] * (len(BUCKETS) + 2)
+            )
+            for index, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    buckets[index] += weight
+                    break
+            else:
+                buckets[len(BUCKETS)] += weight
+            buckets[-1] += value * weight
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': dict(self.counters),
+                'histograms': {
+                    key: list(value)
+                    for key, value in self.histograms.items()
+                },
+            }
+
+    def get_path(self, directory):
+        pid = os.getpid()
+        if self.pid != pid:
+            self.pid = pid
+            self.start = process_start(pid) or str(time.time_ns())
+        return os.path.join(directory, WORKER_FILE.format(pid, self.start))
+
+    def flush(self, force=False):
+        directory = settings.METRICS_DIR
+        now = time.monotonic()
+        if not directory or (
+                not force
+                and now - self.flushed_at < settings.METRICS_FLUSH_INTERVAL):
+            return
+        self.flushed_at = now
+        os.makedirs(directory, exist_ok=True)
+        write(self.get_path(directory), self.snapshot())
+
+    def retire(self):
+        """При выходе процесса переносит его итоги в общий файл."""
+        directory = settings.METRICS_DIR
+        if not directory or self.pid != os.getpid():
+            return
+        self.flush(force=True)
+        with locked(directory):
+            fold(directory, [self.get_path(directory)])
+
+    def collect(self):
+        directory = settings.METRICS_DIR
+        if not directory:
+            return self.snapshot()
+        self.flush(force=True)
+        merged = {'counters': {}, 'histograms': {}}
+        with locked(directory):
+            workers = glob.glob(os.path.join(directory, 'worker-*.json'))
+            dead = [path for path in workers if not is_alive(path)]
+            if dead:
+                fold(directory, dead)
+            aggregate = read(os.path.join(directory, AGGREGATE_FILE))
+            folded = set()
+            if aggregate is not None:
+                merge(merged, aggregate)
+                folded.update(aggregate['folded'])
+            for path in workers:
+                data = read(path)
+                if (path not in dead and data is not None
+                        and os.path.basename(path) not in folded):
+                    merge(merged, data)
+        return merged
+
+
+registry = Registry()
+atexit.register(registry.retire)
+
+
+def format_labels(labels, **extra):
+    labels = dict(labels, **extra)
+    if not labels:
+        return ''
+    escaped = (
+        '{}="{}"'.format(
+            name,
+            str(value).replace('\\', r'\\').replace('"', r'\"')
+            .replace('\n', r'\n'),
+        )
+        for name, value in labels.items()
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def render(data):
+    lines = []
+    by_name = {}
+    for key, value in data['histograms'].items():
+        name, labels = json.loads(key)
+        by_name.setdefault(name, []).append((labels, value))
+    for name, help_text in HISTOGRAMS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for labels, value in sorted(by_name.get(name, ()), key=str):
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ('+Inf',), value[:-1]):
+                cumulative += count
+                lines.append('{}_bucket{} {}'.format(
+                    name, format_labels(labels, le=bound), cumulative
+                ))
+            lines.append(f'{name}_sum{format_labels(labels)} {value[-1]}')
+            lines.append(f'{name}_count{format_labels(labels)} {cumulative}')
+    by_name = {}
+    for key, value in data['counters'].items():
+        name, labels = json.loads(key)
+        by_name.setdefault(name, []).append((labels, value))
+    for name, help_text in COUNTERS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for labels, value in sorted(by_name.get(name, ()), key=str):
+            lines.append(f'{name}{format_labels(labels)} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    return HttpResponse(render(registry.collect()), content_type=CONTENT_TYPE)
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+class MetricsMiddleware:
+    """Замеряет долю ``METRICS_SAMPLE_RATE`` запросов.
+
+    Значения делятся на долю выборки, поэтому счётчики оценивают полный
+    поток запросов.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rate = settings.METRICS_SAMPLE_RATE
+        if rate <= 0 or random.random() >= rate:
+            return self.get_response(request)
+        weight = 1 / rate
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+        match = request.resolver_match
+        view = (match.url_name if match else None) or 'unresolved'
+        registry.observe(
+            'yamdb_http_request_duration_seconds',
+            {'view': view, 'method': request.method,
+             'status': response.status_code},
+            duration,
+            weight,
+        )
+        labels = {'view': view}
+        registry.inc('yamdb_db_queries_total', labels, counter.count * weight)
+        registry.inc(
+            'yamdb_db_query_duration_seconds_total',
+            labels,
+            counter.duration * weight,
+        )
+        if not response.streaming:
+            registry.inc(
+                'yamdb_http_response_size_bytes_total',
+                labels,
+                len(response.content) * weight,
+            )
+        registry.flush()
+        return response
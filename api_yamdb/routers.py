@@ -0,0 +1,118 @@
+"""Маршрутизация чтения на реплики в пределах одного запроса.
+
+Представление включает реплику через :func:`use_replica`, роутер
+направляет на неё чтение, пока контекст запроса не будет сброшен.
+Запись всегда идёт в ``default``.
+"""
+import itertools
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import DatabaseError
+
+PIN_KEY = 'db:pinned:{}'
+# На основной базе pg_last_wal_receive_lsn() пуст, и отставание - NULL.
+LAG_QUERIES = {
+    'postgresql': (
+        'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()'
+        ' THEN 0'
+        ' ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())'
+        ' END'
+    ),
+}
+
+read_alias = ContextVar('read_alias', default=None)
+replica_cycle = itertools.count()
+unhealthy_until = {}
+lag_checked_until = {}
+
+
+def replication_lag(alias):
+    """Отставание реплики в секундах; ``0``, если СУБД его не сообщает."""
+    connection = connections[alias]
+    query = LAG_QUERIES.get(connection.vendor)
+    if query is None:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(query)
+        lag = cursor.fetchone()[0]
+    return float(lag or 0)
+
+
+def is_healthy(alias):
+    """Проверяет соединение и отставание реплики.
+
+    Отставание запрашивается не чаще раза в ``REPLICA_LAG_CHECK_SECONDS``;
+    недоступная или отставшая больше ``REPLICA_MAX_LAG`` секунд реплика
+    пропускается ``REPLICA_RETRY_SECONDS``.
+    """
+    now = time.monotonic()
+    if unhealthy_until.get(alias, 0) > now:
+        return False
+    try:
+        connections[alias].ensure_connection()
+        healthy = (
+            lag_checked_until.get(alias, 0) > now
+            or replication_lag(alias) <= settings.REPLICA_MAX_LAG
+        )
+    except DatabaseError:
+        connections[alias].close()
+        healthy = False
+    if not healthy:
+        unhealthy_until[alias] = now + settings.REPLICA_RETRY_SECONDS
+        return False
+    unhealthy_until.pop(alias, None)
+    if lag_checked_until.get(alias, 0) <= now:
+        lag_checked_until[alias] = now + settings.REPLICA_LAG_CHECK_SECONDS
+    return True
+
+
+def choose_replica():
+    """Следующая исправная реплика по кругу или ``None``."""
+    replicas = settings.DATABASE_REPLICAS
+    start = next(replica_cycle)
+    for shift in range(len(replicas)):
+        alias = replicas[(start + shift) % len(replicas)]
+        if is_healthy(alias):
+            return alias
+    return None
+
+
+def get_cache():
+    return caches[settings.REPLICA_PIN_CACHE_ALIAS]
+
+
+def pin_to_primary(user_id):
+    get_cache().set(
+        PIN_KEY.format(user_id), True, settings.REPLICA_PIN_SECONDS
+    )
+
+
+def is_pinned(user_id):
+    return bool(get_cache().get(PIN_KEY.format(user_id)))
+
+
+def use_replica():
+    alias = choose_replica() if settings.DATABASE_REPLICAS else None
+    return read_alias.set(alias)
+
+
+def reset(token):
+    read_alias.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return read_alias.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
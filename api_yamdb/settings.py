@@ -1,5 +1,6 @@
 import environ
 import os
+import tempfile
 
 from datetime import timedelta
 
@@ -29,12 +30,13 @@ INSTALLED_APPS = [
     'rest_framework',
     'django_filters',
     'rest_framework_simplejwt',
-    'api',
+    'api.apps.ApiConfig',
     'users',
     'reviews',
 ]
 
 MIDDLEWARE = [
+    'api_yamdb.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -65,6 +67,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'api_yamdb.wsgi.application'
 
+ASGI_READ_PATHS = r'^/api/v1/(titles|genres|categories|export)/'
+ASGI_READ_THREADS = env.int('ASGI_READ_THREADS', default=16)
+ASGI_STREAM_THREADS = env.int('ASGI_STREAM_THREADS', default=4)
+
 
 DATABASES = {
     'default': {
@@ -77,6 +83,49 @@ DATABASES = {
     }
 }
 
+for index, url in enumerate(env.list('DB_REPLICA_URLS', default=[]), 1):
+    DATABASES[f'replica_{index}'] = env.db_url_config(url)
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['api_yamdb.routers.ReplicaRouter']
+REPLICA_RETRY_SECONDS = 30
+REPLICA_MAX_LAG = env.float('REPLICA_MAX_LAG', default=5)
+REPLICA_LAG_CHECK_SECONDS = 1
+REPLICA_PIN_SECONDS = env.int('REPLICA_PIN_SECONDS', default=10)
+# Закрепление должны видеть все воркеры: с репликами CACHE_URL указывает
+# на общий кэш, иначе check --deploy выдаёт api.W002.
+REPLICA_PIN_CACHE_ALIAS = 'default'
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+CATALOG_CACHE_ALIAS = 'default'
+CATALOG_CACHE_TIMEOUT = env.int('CATALOG_CACHE_TIMEOUT', default=300)
+FACETS_BACKGROUND_REBUILD = True
+PAGINATION_ESTIMATE_THRESHOLD = 10000
+RATING_PRIOR_WEIGHT = env.int('RATING_PRIOR_WEIGHT', default=10)
+RATING_PRIOR_TIMEOUT = 300
+CATALOG_SNAPSHOT_DIR = env(
+    'CATALOG_SNAPSHOT_DIR', default=tempfile.gettempdir()
+)
+CATALOG_SNAPSHOT_CHECK_INTERVAL = 1
+
+TITLE_BATCH_MAX_SIZE = 100
+BULK_CREATE_MAX_SIZE = 500
+
+LEADERBOARD_SIZE = 10
+LEADERBOARD_MAX_SIZE = 100
+TRENDING_WINDOW_HOURS = env.int('TRENDING_WINDOW_HOURS', default=24)
+RANKINGS_COMPACT_INTERVAL = 300
+
+AUTH_CLAIMS_CACHE_ALIAS = 'default'
+AUTH_CLAIMS_CACHE_TIMEOUT = env.int('AUTH_CLAIMS_CACHE_TIMEOUT', default=60)
+
+METRICS_DIR = env('METRICS_DIR', default='')
+METRICS_SAMPLE_RATE = env.float('METRICS_SAMPLE_RATE', default=0.1)
+METRICS_FLUSH_INTERVAL = 5
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -118,19 +167,51 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.StatelessJWTAuthentication',
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend'
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+EMAIL_BACKEND = env(
+    'EMAIL_BACKEND',
+    default='django.core.mail.backends.smtp.EmailBackend'
+)
 EMAIL_HOST = 'smtp.mail.ru'
 EMAIL_PORT = 2525
 EMAIL_HOST_USER = env('EMAIL_HOST_USER', default='xxxx@gmail.com')
 EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD', default='pass')
 EMAIL_USE_TLS = True
 EMAIL_USE_SSL = False
+EMAIL_TIMEOUT = 30
+
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_BACKOFF = 30
+OUTBOX_POLL_INTERVAL = 5
+OUTBOX_CLAIM_TIMEOUT = 300
+
+COMMENT_WRITE_BEHIND = env.bool('COMMENT_WRITE_BEHIND', default=False)
+COMMENT_JOURNAL_PATH = env(
+    'COMMENT_JOURNAL_PATH',
+    default=os.path.join(BASE_DIR, 'comment-journal.sqlite3'),
+)
+COMMENT_JOURNAL_MAX_SIZE = 10000
+COMMENT_FLUSH_BATCH_SIZE = 500
+COMMENT_FLUSH_INTERVAL = 2
+COMMENT_FLUSH_POLL_INTERVAL = 0.2
+
+EXPORT_OVERLAP = 300
 
 SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer'),
@@ -0,0 +1,100 @@
+"""Детерминированный генератор синтетического каталога.
+
+Одинаковые ``seed`` и размеры всегда дают одинаковые данные, поэтому
+результаты замеров разных версий можно сравнивать между собой.
+"""
+import random
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from api.snapshot import publish
+from reviews.models import (Category, Comment, Genre, GenreTitle, Ranking,
+                            Review, Title, trending_since)
+from reviews.utils import keep_pub_date
+from users.models import User
+
+CONFIRMATION_CODE = 'bench1'
+EPOCH = timezone.datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+def zipf_counts(total, size, exponent, limit, rng):
+    """Разбивает ``total`` на ``size`` слагаемых по закону Ципфа."""
+    weights = [1 / rank ** exponent for rank in range(1, size + 1)]
+    scale = total / sum(weights)
+    counts = [min(limit, int(weight * scale)) for weight in weights]
+    rng.shuffle(counts)
+    return counts
+
+
+def generate(titles=1000, users=200, categories=5, genres=20,
+             genres_per_title=3, reviews=20000, comments_per_review=2,
+             exponent=1.1, seed=42):
+    rng = random.Random(seed)
+    with transaction.atomic(), keep_pub_date(Review, Comment):
+        Category.objects.bulk_create(
+            Category(id=pk, name=f'Категория {pk}', slug=f'category-{pk}')
+            for pk in range(1, categories + 1)
+        )
+        Genre.objects.bulk_create(
+            Genre(id=pk, name=f'Жанр {pk}', slug=f'genre-{pk}')
+            for pk in range(1, genres + 1)
+        )
+        User.objects.bulk_create(
+            (User(id=pk, username=f'user{pk}', email=f'user{pk}@yamdb.fake',
+                  confirmation_code=CONFIRMATION_CODE,
+                  role='admin' if pk == 1 else 'user')
+             for pk in range(1, users + 1)),
+        )
+        Title.objects.bulk_create(
+            (Title(id=pk, name=f'Произведение {pk}',
+                   year=1950 + rng.randrange(70),
+                   description=f'Описание произведения {pk}',
+                   category_id=rng.randint(1, categories))
+             for pk in range(1, titles + 1)),
+        )
+        GenreTitle.objects.bulk_create(
+            (GenreTitle(title_id=title_id, genre_id=genre_id)
+             for title_id in range(1, titles + 1)
+             for genre_id in rng.sample(
+                 range(1, genres + 1), min(genres_per_title, genres)
+             )),
+        )
+        counts = zipf_counts(reviews, titles, exponent, users, rng)
+        review_rows = []
+        for title_id, count in enumerate(counts, start=1):
+            for author_id in rng.sample(range(1, users + 1), count):
+                review_rows.append(Review(
+                    id=len(review_rows) + 1,
+                    title_id=title_id,
+                    author_id=author_id,
+                    text='Текст отзыва ' * rng.randint(1, 20),
+                    score=rng.randint(1, 10),
+                    pub_date=EPOCH + timedelta(
+                        minutes=rng.randrange(500000)
+                    ),
+                ))
+        Review.objects.bulk_create(review_rows)
+        Comment.objects.bulk_create(
+            (Comment(review_id=review.id,
+                     author_id=rng.randint(1, users),
+                     text='Комментарий',
+                     pub_date=review.pub_date + timedelta(minutes=number))
+             for review in review_rows
+             for number in range(comments_per_review)),
+        )
+        Title.objects.rebuild_ratings()
+        Ranking.objects.rebuild_top()
+        Ranking.objects.rebuild_trending(trending_since())
+        transaction.on_commit(publish)
+    return {
+        'titles': titles,
+        'users': users,
+        'categories': categories,
+        'genres': genres,
+        'reviews': len(review_rows),
+        'comments': len(review_rows) * comments_per_review,
+        'max_reviews_per_title': max(counts),
+        'seed': seed,
+    }
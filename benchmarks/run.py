@@ -0,0 +1,202 @@
+"""Нагрузочный прогон эндпоинтов API внутри процесса.
+
+Пример::
+
+    python -m benchmarks.run --titles 2000 --reviews 50000 --output out.json
+
+Для каждого эндпоинта выводятся пропускная способность, перцентили
+задержки и число SQL-запросов в формате JSON.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(share * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def get_scenarios(dataset, client_factory):
+    from reviews.models import Review
+    from users.models import User
+
+    from .generate import CONFIRMATION_CODE
+
+    titles = dataset['titles']
+    users = dataset['users']
+    popular = Review.objects.values('title_id').order_by().annotate(
+        total=django.db.models.Count('id')
+    ).order_by('-total').first()['title_id']
+    review_id = Review.objects.filter(title_id=popular).values_list(
+        'id', flat=True
+    ).first()
+    anonymous = client_factory()
+    writer = client_factory(user_id=User.objects.create(
+        username='bench_writer', email='bench_writer@yamdb.fake'
+    ).pk)
+    counter = iter(range(10 ** 9))
+
+    def get(client, url):
+        return lambda number: client.get(url)
+
+    def signup(number):
+        index = next(counter)
+        return anonymous.post('/api/v1/auth/signup/', {
+            'username': f'bench{index}',
+            'email': f'bench{index}@yamdb.fake',
+        })
+
+    def token(number):
+        return anonymous.post('/api/v1/auth/token/', {
+            'username': f'user{number % users + 1}',
+            'confirmation_code': CONFIRMATION_CODE,
+        })
+
+    def post_review(number):
+        return writer.post(
+            f'/api/v1/titles/{number % titles + 1}/reviews/',
+            {'text': 'Отзыв из нагрузочного теста', 'score': 7},
+        )
+
+    deep_page = max(1, dataset['max_reviews_per_title'] // 5)
+    reviews_url = f'/api/v1/titles/{popular}/reviews/'
+    comments_url = f'{reviews_url}{review_id}/comments/'
+    return {
+        'titles list': get(anonymous, '/api/v1/titles/'),
+        'titles filter genre': get(anonymous, '/api/v1/titles/?genre=genre-1'),
+        'titles filter category+year': get(
+            anonymous, '/api/v1/titles/?category=category-1&year=1990'
+        ),
+        'titles filter name': get(anonymous, '/api/v1/titles/?name=100'),
+        'titles search': get(anonymous, '/api/v1/titles/?search=произведение'),
+        'title detail': get(anonymous, '/api/v1/titles/1/'),
+        'genres list': get(anonymous, '/api/v1/genres/'),
+        'reviews page 1': get(anonymous, reviews_url),
+        'reviews deep page': get(
+            anonymous, f'{reviews_url}?page={deep_page}'
+        ),
+        'reviews cursor': get(anonymous, f'{reviews_url}?cursor='),
+        'comments list': get(anonymous, comments_url),
+        'review post': post_review,
+        'signup': signup,
+        'token': token,
+    }
+
+
+def measure(action, requests, warmup, cold):
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from django.urls import resolve
+
+    for number in range(warmup):
+        action(number)
+    latencies = []
+    queries = []
+    statuses = {}
+    name = None
+    started = time.perf_counter()
+    for number in range(warmup, warmup + requests):
+        if cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            begin = time.perf_counter()
+            response = action(number)
+            latencies.append(time.perf_counter() - begin)
+        queries.append(len(context.captured_queries))
+        statuses[response.status_code] = (
+            statuses.get(response.status_code, 0) + 1
+        )
+        name = name or resolve(response.wsgi_request.path_info).url_name
+    elapsed = time.perf_counter() - started
+    return {
+        'url_name': name,
+        'requests': requests,
+        'throughput_rps': round(requests / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 3),
+        'queries_min': min(queries),
+        'queries_max': max(queries),
+        'queries_mean': round(statistics.mean(queries), 2),
+        'status': {str(code): count for code, count in statuses.items()},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--titles', type=int, default=1000)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--genres', type=int, default=20)
+    parser.add_argument('--categories', type=int, default=5)
+    parser.add_argument('--reviews', type=int, default=20000)
+    parser.add_argument('--comments-per-review', type=int, default=2)
+    parser.add_argument('--zipf', type=float, default=1.1)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument(
+        '--cold', action='store_true',
+        help='Очищать кэш перед каждым запросом',
+    )
+    parser.add_argument(
+        '--only', action='append',
+        help='Прогнать только указанные сценарии',
+    )
+    parser.add_argument('--output', help='Файл для JSON-отчёта')
+    args = parser.parse_args(argv)
+
+    django.setup()
+    from django.core.management import call_command
+    from django.test.utils import setup_test_environment
+    from rest_framework.test import APIClient
+
+    from users.models import User
+
+    from .generate import generate
+
+    setup_test_environment()
+    call_command('migrate', verbosity=0)
+    started = time.perf_counter()
+    dataset = generate(
+        titles=args.titles, users=args.users, categories=args.categories,
+        genres=args.genres, reviews=args.reviews,
+        comments_per_review=args.comments_per_review,
+        exponent=args.zipf, seed=args.seed,
+    )
+    dataset['generate_seconds'] = round(time.perf_counter() - started, 2)
+
+    def client_factory(user_id=None):
+        client = APIClient()
+        if user_id is not None:
+            client.force_authenticate(User.objects.get(pk=user_id))
+        return client
+
+    scenarios = get_scenarios(dataset, client_factory)
+    report = {'dataset': dataset, 'cold_cache': args.cold, 'endpoints': {}}
+    for name, action in scenarios.items():
+        if args.only and name not in args.only:
+            continue
+        report['endpoints'][name] = measure(
+            action, args.requests, args.warmup, args.cold
+        )
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as target:
+            target.write(output)
+    else:
+        sys.stdout.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
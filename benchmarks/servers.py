@@ -0,0 +1,213 @@
+"""Сравнение WSGI и ASGI профилей под медленными клиентами.
+
+Пример::
+
+    python -m benchmarks.servers --slow 50 --concurrency 10 --duration 10
+
+Скрипт готовит базу SQLite с синтетическим каталогом, по очереди
+запускает gunicorn с синхронным воркером и с воркером uvicorn, держит
+``--slow`` соединений, которые передают заголовки по байту, и замеряет
+задержку обычных запросов на чтение. Отчёт выводится в формате JSON.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from .run import percentile
+
+PROFILES = {
+    'wsgi': ('api_yamdb.wsgi:application', ()),
+    'asgi': ('api_yamdb.asgi:application', ('-k', '{asgi_worker}')),
+}
+READ_URLS = (
+    '/api/v1/titles/',
+    '/api/v1/titles/?genre=genre-1',
+    '/api/v1/genres/',
+    '/api/v1/titles/1/reviews/',
+)
+
+
+def prepare_database(path, args):
+    os.environ['BENCH_DB_NAME'] = path
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+    import django
+    django.setup()
+    from django.core.management import call_command
+    from django.db import connections
+
+    from .generate import generate
+
+    call_command('migrate', verbosity=0)
+    dataset = generate(titles=args.titles, reviews=args.reviews)
+    connections.close_all()
+    return dataset
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), 1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'Сервер на порту {port} не запустился')
+
+
+async def slow_client(port, interval, stop):
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    except OSError:
+        return
+    request = b'GET /api/v1/titles/ HTTP/1.1\r\nHost: bench\r\nX-Slow: '
+    try:
+        writer.write(request)
+        while not stop.is_set():
+            await asyncio.sleep(interval)
+            writer.write(b'a')
+            await writer.drain()
+    except OSError:
+        pass
+    finally:
+        writer.close()
+
+
+async def fetch(port, path, timeout):
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection('127.0.0.1', port), timeout
+    )
+    try:
+        writer.write(
+            f'GET {path} HTTP/1.1\r\nHost: bench\r\n'
+            'Connection: close\r\n\r\n'.encode()
+        )
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), timeout)
+        return int(response.split(b' ', 2)[1])
+    finally:
+        writer.close()
+
+
+async def fast_client(port, stop, timeout, latencies, errors):
+    number = 0
+    while not stop.is_set():
+        path = READ_URLS[number % len(READ_URLS)]
+        number += 1
+        started = time.perf_counter()
+        try:
+            status = await fetch(port, path, timeout)
+        except (OSError, asyncio.TimeoutError, IndexError, ValueError):
+            errors.append(path)
+            continue
+        if status == 200:
+            latencies.append(time.perf_counter() - started)
+        else:
+            errors.append(path)
+
+
+async def load(port, args):
+    stop = asyncio.Event()
+    latencies = []
+    errors = []
+    slow = [
+        asyncio.ensure_future(slow_client(port, args.slow_interval, stop))
+        for _ in range(args.slow)
+    ]
+    await asyncio.sleep(0.5)
+    fast = [
+        asyncio.ensure_future(
+            fast_client(port, stop, args.timeout, latencies, errors)
+        )
+        for _ in range(args.concurrency)
+    ]
+    await asyncio.sleep(args.duration)
+    stop.set()
+    await asyncio.gather(*fast, *slow)
+    result = {
+        'completed': len(latencies),
+        'errors': len(errors),
+        'throughput_rps': round(len(latencies) / args.duration, 1),
+    }
+    if latencies:
+        result.update({
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        })
+    return result
+
+
+def run_profile(name, database, args):
+    app, extra = PROFILES[name]
+    command = [
+        sys.executable, '-m', 'gunicorn', app,
+        '--bind', f'127.0.0.1:{args.port}',
+        '--workers', str(args.workers),
+        *(item.format(asgi_worker=args.asgi_worker) for item in extra),
+    ]
+    env = dict(
+        os.environ,
+        BENCH_DB_NAME=database,
+        DJANGO_SETTINGS_MODULE='benchmarks.settings',
+    )
+    server = subprocess.Popen(
+        command, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_port(args.port)
+        return asyncio.get_event_loop().run_until_complete(
+            load(args.port, args)
+        )
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--titles', type=int, default=500)
+    parser.add_argument('--reviews', type=int, default=5000)
+    parser.add_argument('--slow', type=int, default=50)
+    parser.add_argument('--slow-interval', type=float, default=1.0)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--timeout', type=float, default=5)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument(
+        '--asgi-worker', default='uvicorn.workers.UvicornWorker'
+    )
+    parser.add_argument(
+        '--profile', action='append', choices=tuple(PROFILES)
+    )
+    parser.add_argument('--output', help='Файл для JSON-отчёта')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, 'bench.sqlite3')
+        report = {
+            'dataset': prepare_database(database, args),
+            'slow_clients': args.slow,
+            'concurrency': args.concurrency,
+            'workers': args.workers,
+            'profiles': {},
+        }
+        for name in args.profile or tuple(PROFILES):
+            report['profiles'][name] = run_profile(name, database, args)
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as target:
+            target.write(output)
+    else:
+        sys.stdout.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,22 @@
+import os
+
+from api_yamdb.settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': os.environ.get(
+            'BENCH_DB_ENGINE', 'django.db.backends.sqlite3'
+        ),
+        'NAME': os.environ.get('BENCH_DB_NAME', ':memory:'),
+        'USER': os.environ.get('POSTGRES_USER', 'postgres'),
+        'PASSWORD': os.environ.get('POSTGRES_PASSWORD', 'postgres'),
+        'HOST': os.environ.get('DB_HOST', ''),
+        'PORT': os.environ.get('DB_PORT', ''),
+    }
+}
+
+ALLOWED_HOSTS = ['*']
+
+EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+
+PASSWORD_HASHERS = ('django.contrib.auth.hashers.MD5PasswordHasher',)
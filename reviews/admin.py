@@ -31,6 +31,7 @@ class TitleAdmin(admin.ModelAdmin):
         'name',
         'year',
         'description',
-        'category'
+        'category',
+        'rating'
     )
     empty_value_display = settings.VOID
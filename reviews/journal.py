@@ -0,0 +1,175 @@
+"""Локальный журнал комментариев для отложенной записи в базу.
+
+Принятый комментарий сначала дописывается в файл SQLite на диске хоста
+(``COMMENT_JOURNAL_PATH``) с ``synchronous=FULL``, а команда
+``flush_comments`` переносит записи в ``reviews.Comment`` пакетами.
+Запись журнала удаляется только после фиксации пакета в базе.
+``pub_date`` комментария - время приёма, а ``updated_at`` ставится при
+переносе, поэтому выгрузка по ``updated_at`` (``reviews.exporters``)
+видит комментарий после его фиксации в базе.
+
+У журнала есть случайный ключ; в той же транзакции, что и вставка
+пакета, в ``CommentJournalMark`` сохраняется id последней перенесённой
+записи. Если процесс упадёт между фиксацией и очисткой журнала, при
+повторе уже перенесённые записи пропускаются, а не вставляются дважды.
+"""
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import transaction
+
+from users.models import User
+from .models import Comment, CommentJournalMark, Review
+from .utils import bulk_insert, keep_pub_date
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)',
+    'CREATE TABLE IF NOT EXISTS entries ('
+    ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+    ' review_id INTEGER NOT NULL,'
+    ' author_id INTEGER NOT NULL,'
+    ' text TEXT NOT NULL,'
+    ' pub_date TEXT NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS entries_review_author'
+    ' ON entries (review_id, author_id)',
+)
+COLUMNS = 'id, review_id, author_id, text, pub_date'
+
+
+class CommentJournal:
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        with self.connect() as connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+            connection.execute(
+                'INSERT OR IGNORE INTO meta VALUES (?, ?)',
+                ('key', uuid.uuid4().hex),
+            )
+            self.key, = connection.execute(
+                "SELECT value FROM meta WHERE key = 'key'"
+            ).fetchone()
+
+    def connect(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path, timeout=30, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=FULL')
+            self.local.connection = connection
+        return connection
+
+    def append(self, comment, limit):
+        """Дописывает комментарий; ``False``, если в журнале ``limit``."""
+        connection = self.connect()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            pending, = connection.execute(
+                'SELECT COUNT(*) FROM entries'
+            ).fetchone()
+            if pending < limit:
+                connection.execute(
+                    'INSERT INTO entries'
+                    ' (review_id, author_id, text, pub_date)'
+                    ' VALUES (?, ?, ?, ?)',
+                    (
+                        comment.review_id,
+                        comment.author_id,
+                        comment.text,
+                        comment.pub_date.astimezone(timezone.utc).isoformat(),
+                    ),
+                )
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return pending < limit
+
+    def entries(self, query, params):
+        return [
+            Comment(
+                review_id=review_id,
+                author_id=author_id,
+                text=text,
+                pub_date=datetime.fromisoformat(pub_date),
+            )
+            for _, review_id, author_id, text, pub_date
+            in self.connect().execute(
+                f'SELECT {COLUMNS} FROM entries {query}', params
+            )
+        ]
+
+    def pending_for(self, review_id, author_id):
+        """Ещё не перенесённые комментарии автора, новые первыми."""
+        return self.entries(
+            'WHERE review_id = ? AND author_id = ? ORDER BY id DESC',
+            (review_id, author_id),
+        )
+
+    def is_due(self, batch_size, max_age):
+        """Пора переносить: набран пакет или старейшей записи ``max_age``."""
+        pending, oldest = self.connect().execute(
+            'SELECT COUNT(*), MIN(pub_date) FROM entries'
+        ).fetchone()
+        if not pending:
+            return False
+        age = datetime.now(timezone.utc) - datetime.fromisoformat(oldest)
+        return pending >= batch_size or age.total_seconds() >= max_age
+
+    def flush(self, batch_size):
+        """Переносит в базу до ``batch_size`` записей, возвращает их число."""
+        rows = self.connect().execute(
+            f'SELECT {COLUMNS} FROM entries ORDER BY id LIMIT ?',
+            (batch_size,),
+        ).fetchall()
+        if not rows:
+            return 0
+        with transaction.atomic():
+            mark, _ = CommentJournalMark.objects.select_for_update(
+            ).get_or_create(journal=self.key)
+            rows = [row for row in rows if row[0] > mark.last_entry]
+            if rows:
+                # Комментарии к удалённым отзывам и от удалённых авторов
+                # удалил бы каскад; без фильтра вставка всего пакета
+                # падала бы на внешнем ключе при каждом повторе.
+                alive = set(Review.objects.filter(
+                    pk__in={row[1] for row in rows}
+                ).values_list('pk', flat=True))
+                authors = set(User.objects.filter(
+                    pk__in={row[2] for row in rows}
+                ).values_list('pk', flat=True))
+                with keep_pub_date(Comment):
+                    bulk_insert(Comment.objects, [
+                        Comment(
+                            review_id=review_id,
+                            author_id=author_id,
+                            text=text,
+                            pub_date=datetime.fromisoformat(pub_date),
+                        )
+                        for _, review_id, author_id, text, pub_date in rows
+                        if review_id in alive and author_id in authors
+                    ])
+                mark.last_entry = rows[-1][0]
+                mark.save(update_fields=('last_entry',))
+        self.connect().execute(
+            'DELETE FROM entries WHERE id <= ?', (mark.last_entry,)
+        )
+        return len(rows)
+
+
+journals = {}
+journals_lock = threading.Lock()
+
+
+def get_journal():
+    path = settings.COMMENT_JOURNAL_PATH
+    with journals_lock:
+        if path not in journals:
+            journals[path] = CommentJournal(path)
+        return journals[path]
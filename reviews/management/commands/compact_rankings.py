@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.cache import INVALIDATES, bump_versions
+from reviews.models import Ranking, Title, trending_since
+
+
+class Command(BaseCommand):
+    help = 'Сдвигает окно популярных произведений и пересобирает рейтинги'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Сжать рейтинги один раз и завершиться',
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Пересобрать также таблицы лучших произведений',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=settings.RANKINGS_COMPACT_INTERVAL,
+            help='Пауза в секундах между сжатиями',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            with transaction.atomic():
+                if options['rebuild']:
+                    Ranking.objects.rebuild_top()
+                Ranking.objects.rebuild_trending(trending_since())
+            # Таблицы читаются в ответах /top/ и /trending/ из кэша titles.
+            bump_versions(INVALIDATES[Title])
+            if options['once']:
+                break
+            time.sleep(options['interval'])
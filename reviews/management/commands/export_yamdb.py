@@ -0,0 +1,55 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from reviews.exporters import FORMATS, RESOURCES, export
+
+CSV_SINGLE_RESOURCE = 'Формат csv выгружает только один ресурс'
+BAD_SINCE = 'Не удалось разобрать дату {}'
+
+
+class Command(BaseCommand):
+    help = 'Потоково выгружает произведения, отзывы и комментарии'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format', choices=FORMATS, default='ndjson', dest='output'
+        )
+        parser.add_argument(
+            '--resource',
+            action='append',
+            choices=RESOURCES,
+            dest='resources',
+            help='Можно указать несколько раз; по умолчанию все',
+        )
+        parser.add_argument(
+            '--since',
+            help=(
+                'Выгрузить отзывы и комментарии, изменённые с этой даты'
+                ' (ISO 8601), обычно водяной знак прошлой выгрузки'
+            ),
+        )
+        parser.add_argument('--file', help='Файл вместо stdout')
+
+    def handle(self, *args, **options):
+        resources = options['resources'] or list(RESOURCES)
+        if options['output'] == 'csv' and len(resources) != 1:
+            raise CommandError(CSV_SINGLE_RESOURCE)
+        since = None
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError(BAD_SINCE.format(options['since']))
+        until = timezone.now()
+        target = sys.stdout
+        if options['file']:
+            target = open(options['file'], 'w', encoding='utf-8')
+        try:
+            for chunk in export(options['output'], resources, since, until):
+                target.write(chunk)
+        finally:
+            if target is not sys.stdout:
+                target.close()
+        self.stderr.write(f'watermark: {until.isoformat()}')
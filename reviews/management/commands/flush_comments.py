@@ -0,0 +1,70 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.cache import INVALIDATES, bump_versions
+from api.checks import catalog_cache_is_local
+from reviews.journal import get_journal
+from reviews.models import Comment
+
+MESS_LOCAL_CACHE = (
+    'Для переноса журнала в фоне нужен общий кэш каталога (CACHE_URL): '
+    'версии комментариев, сдвинутые этим процессом, не увидят воркеры web'
+)
+
+
+class Command(BaseCommand):
+    help = 'Переносит комментарии из локального журнала в базу пакетами'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Перенести весь журнал один раз и завершиться',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.COMMENT_FLUSH_BATCH_SIZE,
+        )
+        parser.add_argument(
+            '--max-age',
+            type=float,
+            default=settings.COMMENT_FLUSH_INTERVAL,
+            help='Перенести неполный пакет, когда записи столько секунд',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=settings.COMMENT_FLUSH_POLL_INTERVAL,
+            help='Пауза в секундах между проверками журнала',
+        )
+
+    def handle(self, *args, **options):
+        if (settings.COMMENT_WRITE_BEHIND and not options['once']
+                and catalog_cache_is_local()):
+            raise CommandError(MESS_LOCAL_CACHE)
+        # Записи, оставшиеся после падения, переносятся первым проходом.
+        journal = get_journal()
+        batch_size = options['batch_size']
+        while True:
+            if options['once'] or journal.is_due(
+                batch_size, options['max_age']
+            ):
+                self.drain(journal, batch_size)
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+
+    def drain(self, journal, batch_size):
+        total = 0
+        while True:
+            flushed = journal.flush(batch_size)
+            total += flushed
+            if flushed < batch_size:
+                break
+        if total:
+            bump_versions(INVALIDATES[Comment])
+            self.stdout.write(f'Перенесено комментариев: {total}')
+        return total
@@ -0,0 +1,311 @@
+import csv
+import json
+import os
+import time
+from itertools import islice
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from api.cache import INVALIDATES, bump_versions
+from api.facets import invalidate_index
+from api.snapshot import publish
+from reviews.models import Category, Comment, Genre, GenreTitle, Review, Title
+from reviews.utils import keep_pub_date
+from users.models import User
+
+BATCH_SIZE = 5000
+
+# Порядок загрузки важен: сначала справочники, потом зависимые таблицы.
+ENTITIES = (
+    ('category', ('category', 'categories')),
+    ('genre', ('genre', 'genres')),
+    ('users', ('users', 'user')),
+    ('titles', ('titles', 'title')),
+    ('genre_title', ('genre_title', 'genre_titles')),
+    ('review', ('review', 'reviews')),
+    ('comments', ('comments', 'comment')),
+)
+MODELS = {
+    'category': Category,
+    'genre': Genre,
+    'users': User,
+    'titles': Title,
+    'genre_title': GenreTitle,
+    'review': Review,
+    'comments': Comment,
+}
+UNKNOWN_FILE = 'Не удалось определить таблицу для файла {}'
+UNKNOWN_SLUG = 'Неизвестный slug {} в файле {}'
+MISSING_ID = (
+    'Для привязки жанров в файле {} укажите id произведений '
+    'или загрузите их отдельным файлом genre_title'
+)
+
+
+def read_rows(path):
+    """Построчно читает CSV или NDJSON, не загружая файл в память."""
+    with open(path, encoding='utf-8', newline='') as source:
+        if path.endswith(('.ndjson', '.jsonl', '.json')):
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(source)
+
+
+def chunked(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def as_int(value):
+    if value in (None, ''):
+        return None
+    return int(value)
+
+
+def as_list(value):
+    if isinstance(value, list):
+        return value
+    return [item for item in (value or '').split(',') if item]
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково загружает CSV/NDJSON с категориями, жанрами, '
+        'пользователями, произведениями, отзывами и комментариями'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths',
+            nargs='+',
+            help='Файлы или каталоги; таблица определяется по имени файла',
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--ignore-conflicts',
+            action='store_true',
+            help='Пропускать строки, нарушающие уникальность',
+        )
+        parser.add_argument(
+            '--defer-indexes',
+            action='store_true',
+            help='Удалить индексы отзывов и комментариев на время загрузки',
+        )
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.ignore_conflicts = options['ignore_conflicts']
+        files = self.collect_files(options['paths'])
+        self.category_ids = dict(Category.objects.values_list('slug', 'id'))
+        self.genre_ids = dict(Genre.objects.values_list('slug', 'id'))
+        deferred = (Review, Comment) if options['defer_indexes'] else ()
+        started = time.monotonic()
+        total = 0
+        self.drop_indexes(deferred)
+        try:
+            with keep_pub_date(Review, Comment):
+                for entity, path in files:
+                    total += self.load(entity, path)
+        finally:
+            self.create_indexes(deferred)
+        loaded = {entity for entity, _ in files}
+        self.reset_sequences([MODELS[entity] for entity in loaded])
+        if loaded & {'titles', 'review'}:
+            call_command('rebuild_ratings', stdout=self.stdout)
+        if loaded & {'titles', 'genre_title', 'review'}:
+            call_command('compact_rankings', once=True, rebuild=True)
+        bump_versions({
+            resource
+            for resources in INVALIDATES.values()
+            for resource in resources
+        })
+        invalidate_index()
+        if loaded & {'genre', 'category'}:
+            publish()
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено строк: {total} за {elapsed:.1f} с '
+            f'({total / max(elapsed, 1e-9):.0f} строк/с)'
+        ))
+
+    def collect_files(self, paths):
+        found = {}
+        for path in paths:
+            if os.path.isdir(path):
+                names = [os.path.join(path, name) for name in os.listdir(path)]
+            else:
+                names = [path]
+            for name in names:
+                stem = os.path.splitext(os.path.basename(name))[0].lower()
+                for entity, aliases in ENTITIES:
+                    if stem in aliases:
+                        found[entity] = name
+                        break
+                else:
+                    if not os.path.isdir(path):
+                        raise CommandError(UNKNOWN_FILE.format(name))
+        return [
+            (entity, found[entity])
+            for entity, _ in ENTITIES if entity in found
+        ]
+
+    def load(self, entity, path):
+        build = getattr(self, f'build_{entity}')
+        model = MODELS[entity]
+        started = time.monotonic()
+        count = 0
+        for chunk in chunked(read_rows(path), self.batch_size):
+            objects = []
+            links = []
+            for row in chunk:
+                obj = build(row, path)
+                objects.append(obj)
+                if entity == 'titles':
+                    links.append(as_list(row.get('genre')))
+            with transaction.atomic():
+                model.objects.bulk_create(
+                    objects, ignore_conflicts=self.ignore_conflicts
+                )
+                if links:
+                    self.link_genres(objects, links, path)
+            count += len(objects)
+        if entity in ('category', 'genre'):
+            self.category_ids = dict(
+                Category.objects.values_list('slug', 'id')
+            )
+            self.genre_ids = dict(Genre.objects.values_list('slug', 'id'))
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'{entity}: {count} строк за {elapsed:.1f} с '
+            f'({count / max(elapsed, 1e-9):.0f} строк/с)'
+        )
+        return count
+
+    def link_genres(self, titles, links, path):
+        rows = []
+        for title, genres in zip(titles, links):
+            if title.pk is None and genres:
+                raise CommandError(MISSING_ID.format(path))
+            rows.extend(
+                GenreTitle(title_id=title.pk, genre_id=self.genre_id(
+                    genre, path
+                ))
+                for genre in genres
+            )
+        GenreTitle.objects.bulk_create(
+            rows, ignore_conflicts=self.ignore_conflicts
+        )
+
+    def resolve(self, value, ids, path):
+        if value in (None, ''):
+            return None
+        if isinstance(value, int) or value.isdigit():
+            return int(value)
+        try:
+            return ids[value]
+        except KeyError:
+            raise CommandError(UNKNOWN_SLUG.format(value, path))
+
+    def category_id(self, value, path):
+        return self.resolve(value, self.category_ids, path)
+
+    def genre_id(self, value, path):
+        return self.resolve(value, self.genre_ids, path)
+
+    def pub_date(self, row):
+        value = row.get('pub_date')
+        if not value:
+            return timezone.now()
+        return parse_datetime(value)
+
+    def build_category(self, row, path):
+        return Category(
+            id=as_int(row.get('id')), name=row['name'], slug=row['slug']
+        )
+
+    def build_genre(self, row, path):
+        return Genre(
+            id=as_int(row.get('id')), name=row['name'], slug=row['slug']
+        )
+
+    def build_users(self, row, path):
+        return User(
+            id=as_int(row.get('id')),
+            username=row['username'],
+            email=row['email'],
+            role=row.get('role') or 'user',
+            bio=row.get('bio') or '',
+            first_name=row.get('first_name') or '',
+            last_name=row.get('last_name') or '',
+        )
+
+    def build_titles(self, row, path):
+        return Title(
+            id=as_int(row.get('id')),
+            name=row['name'],
+            year=as_int(row.get('year')),
+            description=row.get('description') or '',
+            category_id=self.category_id(row.get('category'), path),
+        )
+
+    def build_genre_title(self, row, path):
+        return GenreTitle(
+            id=as_int(row.get('id')),
+            title_id=as_int(row.get('title_id') or row.get('title')),
+            genre_id=self.genre_id(
+                row.get('genre_id') or row.get('genre'), path
+            ),
+        )
+
+    def build_review(self, row, path):
+        return Review(
+            id=as_int(row.get('id')),
+            title_id=as_int(row.get('title_id') or row.get('title')),
+            author_id=as_int(row.get('author_id') or row.get('author')),
+            text=row['text'],
+            score=as_int(row['score']),
+            pub_date=self.pub_date(row),
+        )
+
+    def build_comments(self, row, path):
+        return Comment(
+            id=as_int(row.get('id')),
+            review_id=as_int(row.get('review_id') or row.get('review')),
+            author_id=as_int(row.get('author_id') or row.get('author')),
+            text=row['text'],
+            pub_date=self.pub_date(row),
+        )
+
+    def drop_indexes(self, models):
+        if not models:
+            return
+        with connection.schema_editor() as editor:
+            for model in models:
+                for index in model._meta.indexes:
+                    editor.remove_index(model, index)
+
+    def create_indexes(self, models):
+        if not models:
+            return
+        with connection.schema_editor() as editor:
+            for model in models:
+                for index in model._meta.indexes:
+                    editor.add_index(model, index)
+
+    def reset_sequences(self, models):
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        if statements:
+            with connection.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
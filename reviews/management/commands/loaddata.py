@@ -0,0 +1,32 @@
+from django.core.management import call_command
+from django.core.management.commands import loaddata
+
+from api.cache import INVALIDATES, bump_versions
+from api.facets import invalidate_index
+from api.snapshot import publish
+
+
+class Command(loaddata.Command):
+    """``loaddata`` с пересчётом хранимых рейтингов после загрузки.
+
+    Объекты фикстур сохраняются с ``raw=True``: ``Review.save`` и сигналы
+    моделей для них не срабатывают, поэтому агрегаты произведений и
+    таблицы рейтингов пересобираются целиком, а снимок каталога, индекс
+    фасетов и кэш ответов обновляются, как после ``import_yamdb``.
+    """
+
+    def handle(self, *fixture_labels, **options):
+        super().handle(*fixture_labels, **options)
+        if not self.loaded_object_count:
+            return
+        call_command(
+            'rebuild_ratings', verbosity=self.verbosity, stdout=self.stdout
+        )
+        call_command('compact_rankings', once=True, rebuild=True)
+        bump_versions({
+            resource
+            for resources in INVALIDATES.values()
+            for resource in resources
+        })
+        invalidate_index()
+        publish(self.using)
@@ -0,0 +1,76 @@
+from django.contrib.postgres import operations
+from django.db import migrations
+
+SQLITE_FORWARD = (
+    "CREATE VIRTUAL TABLE reviews_title_fts USING fts5("
+    "name, description, content='reviews_title', content_rowid='id')",
+    "CREATE TRIGGER reviews_title_fts_ai AFTER INSERT ON reviews_title BEGIN "
+    "INSERT INTO reviews_title_fts(rowid, name, description) "
+    "VALUES (new.id, new.name, new.description); END",
+    "CREATE TRIGGER reviews_title_fts_ad AFTER DELETE ON reviews_title BEGIN "
+    "INSERT INTO reviews_title_fts(reviews_title_fts, rowid, name, "
+    "description) VALUES ('delete', old.id, old.name, old.description); END",
+    "CREATE TRIGGER reviews_title_fts_au AFTER UPDATE OF name, description "
+    "ON reviews_title BEGIN "
+    "INSERT INTO reviews_title_fts(reviews_title_fts, rowid, name, "
+    "description) VALUES ('delete', old.id, old.name, old.description); "
+    "INSERT INTO reviews_title_fts(rowid, name, description) "
+    "VALUES (new.id, new.name, new.description); END",
+    "INSERT INTO reviews_title_fts(reviews_title_fts) VALUES ('rebuild')",
+)
+SQLITE_BACKWARD = (
+    'DROP TRIGGER IF EXISTS reviews_title_fts_au',
+    'DROP TRIGGER IF EXISTS reviews_title_fts_ad',
+    'DROP TRIGGER IF EXISTS reviews_title_fts_ai',
+    'DROP TABLE IF EXISTS reviews_title_fts',
+)
+POSTGRES_FORWARD = (
+    "CREATE INDEX reviews_title_search_idx ON reviews_title USING GIN "
+    "(to_tsvector('russian'::regconfig, COALESCE(name, '') || ' ' "
+    "|| COALESCE(description, '')))",
+    'CREATE INDEX reviews_title_name_trgm_idx ON reviews_title USING GIN '
+    '(UPPER(name::text) gin_trgm_ops)',
+)
+POSTGRES_BACKWARD = (
+    'DROP INDEX IF EXISTS reviews_title_name_trgm_idx',
+    'DROP INDEX IF EXISTS reviews_title_search_idx',
+)
+
+
+class TrigramExtension(operations.TrigramExtension):
+    """``pg_trgm`` для индекса по ``UPPER(name)``.
+
+    Расширение ставит суперпользователь, а с PostgreSQL 13 - и владелец
+    базы с правом CREATE. Без этих прав выполните ``CREATE EXTENSION
+    pg_trgm`` заранее: если расширение уже есть, миграция его не трогает.
+    На других СУБД операция ничего не делает.
+    """
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        # Расширение может понадобиться другим объектам базы.
+        pass
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        for statement in statements.get(vendor, ()):
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0004_pub_date_indexes'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(
+            run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            run({'sqlite': SQLITE_BACKWARD,
+                 'postgresql': POSTGRES_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 3.0.5 on 2026-10-18 05:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_top_boards(apps, schema_editor):
+    # Таблицу trending заполняет первое сжатие (compact_rankings).
+    Title = apps.get_model('reviews', 'Title')
+    GenreTitle = apps.get_model('reviews', 'GenreTitle')
+    Ranking = apps.get_model('reviews', 'Ranking')
+    rows = []
+    for title_id, category_id, rating in Title.objects.values_list(
+        'id', 'category_id', 'rating'
+    ).iterator():
+        rows.append(Ranking(board='top', title_id=title_id, score=rating))
+        if category_id is not None:
+            rows.append(Ranking(
+                board=f'top:category:{category_id}',
+                title_id=title_id,
+                score=rating,
+            ))
+    for genre_id, title_id, rating in GenreTitle.objects.values_list(
+        'genre_id', 'title_id', 'title__rating'
+    ).iterator():
+        rows.append(Ranking(
+            board=f'top:genre:{genre_id}', title_id=title_id, score=rating
+        ))
+    Ranking.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0006_title_score_histogram'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Ranking',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('board', models.CharField(max_length=64, verbose_name='Таблица')),
+                ('score', models.FloatField(null=True, verbose_name='Значение')),
+            ],
+            options={
+                'verbose_name': 'Место в рейтинге',
+                'verbose_name_plural': 'Рейтинги',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['pub_date'], name='review_pub_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='ranking',
+            name='title',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rankings', to='reviews.Title', verbose_name='Произведение'),
+        ),
+        migrations.AddIndex(
+            model_name='ranking',
+            index=models.Index(fields=['board', '-score', 'title'], name='ranking_board_score_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='ranking',
+            constraint=models.UniqueConstraint(fields=('board', 'title'), name='one_ranking_per_board'),
+        ),
+        migrations.RunPython(fill_top_boards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.0.5 on 2026-10-18 06:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0007_rankings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommentJournalMark',
+            fields=[
+                ('journal', models.CharField(max_length=32, primary_key=True, serialize=False, verbose_name='Журнал')),
+                ('last_entry', models.BigIntegerField(default=0, verbose_name='Последняя запись')),
+            ],
+            options={
+                'verbose_name': 'Отметка журнала комментариев',
+                'verbose_name_plural': 'Отметки журналов комментариев',
+            },
+        ),
+    ]
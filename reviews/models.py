@@ -1,11 +1,35 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import IntegrityError, connections, models, transaction
+from django.db.models import (Case, Count, F, FloatField, Q, Subquery, Sum,
+                              When)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_save)
+from django.utils import timezone
+from django.dispatch import receiver
 
 from users.models import User
+from .utils import bulk_insert
 from .validators import validate_year
 
 MAX_SCORE = 'Максимальная оценка'
 MIN_SCORE = 'Минимальная оценка'
+SEARCH_CONFIG = 'russian'
+SQLITE_SEARCH_TABLE = 'reviews_title_fts'
+SCORES = range(1, 11)
+HISTOGRAM_FIELDS = tuple(f'score_{score}' for score in SCORES)
+REVIEW_AGGREGATES = ('score_sum', 'review_count', 'rating', *HISTOGRAM_FIELDS)
+BOARD_TOP = 'top'
+BOARD_CATEGORY = 'top:category:{}'
+BOARD_GENRE = 'top:genre:{}'
+BOARD_TRENDING = 'trending'
+RANKING_BATCH_SIZE = 1000
+RATING_BATCH_SIZE = 1000
 
 
 class Category(models.Model):
@@ -46,6 +70,137 @@ class Genre(models.Model):
         ordering = ('name',)
 
 
+class TitleQuerySet(models.QuerySet):
+    def apply_review_delta(self, title_id, added=None, removed=None):
+        """Учитывает добавленную и снятую оценку одним UPDATE."""
+        return self.apply_review_scores(
+            title_id,
+            added=() if added is None else (added,),
+            removed=() if removed is None else (removed,),
+        )
+
+    def apply_review_scores(self, title_id, added=(), removed=()):
+        """Учитывает списки добавленных и снятых оценок одним UPDATE.
+
+        Двигает сумму оценок, число отзывов, рейтинг и счётчики
+        гистограммы.
+        """
+        score_delta = sum(added) - sum(removed)
+        count_delta = len(added) - len(removed)
+        new_sum = F('score_sum') + score_delta
+        new_count = F('review_count') + count_delta
+        counts = Counter(added)
+        counts.subtract(removed)
+        histogram = {
+            HISTOGRAM_FIELDS[score - 1]: F(HISTOGRAM_FIELDS[score - 1]) + delta
+            for score, delta in counts.items()
+            if delta
+        }
+        return self.filter(pk=title_id).update(
+            **histogram,
+            score_sum=new_sum,
+            review_count=new_count,
+            rating=Case(
+                When(
+                    review_count__gt=-count_delta,
+                    then=Cast(new_sum, FloatField())
+                    / Cast(new_count, FloatField())
+                ),
+                default=None,
+                output_field=FloatField(),
+            ),
+        )
+
+    def rebuild_ratings(self):
+        """Пересчитывает сохранённые агрегаты по таблице отзывов.
+
+        Агрегаты всех выбранных произведений считаются одним запросом с
+        GROUP BY по ``title_id`` и записываются через ``bulk_update``.
+        """
+        titles = list(self.order_by().only('pk'))
+        rows = Review.objects.using(self.db).filter(
+            title__in=[title.pk for title in titles]
+        ).order_by().values('title_id').annotate(
+            score_sum=Sum('score'),
+            review_count=Count('id'),
+            **{
+                field: Count('id', filter=Q(score=score))
+                for score, field in zip(SCORES, HISTOGRAM_FIELDS)
+            },
+        )
+        totals = {row.pop('title_id'): row for row in rows}
+        empty = dict.fromkeys(
+            ('score_sum', 'review_count', *HISTOGRAM_FIELDS), 0
+        )
+        for title in titles:
+            row = totals.get(title.pk, empty)
+            for field, value in row.items():
+                setattr(title, field, value)
+            title.rating = (
+                row['score_sum'] / row['review_count']
+                if row['review_count'] else None
+            )
+        self.model.objects.db_manager(self.db).bulk_update(
+            titles, REVIEW_AGGREGATES, batch_size=RATING_BATCH_SIZE
+        )
+        return len(titles)
+
+    def mean_score(self):
+        """Средняя оценка по всем отзывам выбранных произведений."""
+        totals = self.aggregate(
+            score_sum=Sum('score_sum'), review_count=Sum('review_count')
+        )
+        if not totals['review_count']:
+            return None
+        return totals['score_sum'] / totals['review_count']
+
+    def search(self, query):
+        """Полнотекстовый поиск по названию и описанию с рангом.
+
+        На PostgreSQL используется GIN-индекс по ``to_tsvector``, на
+        SQLite - таблица FTS5, которые создаёт миграция ``0005``.
+        Результат упорядочен по убыванию ``search_rank``.
+        """
+        vendor = connections[self.db].vendor
+        if vendor == 'postgresql':
+            from django.contrib.postgres.search import (SearchQuery,
+                                                        SearchRank,
+                                                        SearchVector)
+            vector = SearchVector('name', 'description', config=SEARCH_CONFIG)
+            search_query = SearchQuery(query, config=SEARCH_CONFIG)
+            return self.annotate(
+                search_vector=vector,
+                search_rank=SearchRank(vector, search_query),
+            ).filter(search_vector=search_query).order_by('-search_rank')
+        if vendor == 'sqlite':
+            match = ' '.join(
+                '"{}"*'.format(word.replace('"', '""'))
+                for word in query.split()
+            )
+            if not match:
+                return self.none()
+            found = RawSQL(
+                f'SELECT rowid FROM {SQLITE_SEARCH_TABLE} '
+                f'WHERE {SQLITE_SEARCH_TABLE} MATCH %s',
+                (match,),
+            )
+            rank = RawSQL(
+                f'SELECT -bm25({SQLITE_SEARCH_TABLE}) '
+                f'FROM {SQLITE_SEARCH_TABLE} '
+                f'WHERE {SQLITE_SEARCH_TABLE} MATCH %s '
+                f'AND rowid = {Title._meta.db_table}.id',
+                (match,),
+                output_field=FloatField(),
+            )
+            return self.filter(id__in=found).annotate(
+                search_rank=rank
+            ).order_by('-search_rank')
+        return self.filter(
+            models.Q(name__icontains=query)
+            | models.Q(description__icontains=query)
+        )
+
+
 class Title(models.Model):
     name = models.CharField(
         verbose_name='Наименование',
@@ -78,21 +233,114 @@ class Title(models.Model):
         max_length=256,
         blank=True,
     )
+    score_sum = models.PositiveIntegerField(
+        verbose_name='Сумма оценок',
+        default=0,
+        editable=False,
+    )
+    review_count = models.PositiveIntegerField(
+        verbose_name='Количество отзывов',
+        default=0,
+        editable=False,
+    )
+    rating = models.FloatField(
+        verbose_name='Рейтинг',
+        null=True,
+        blank=True,
+        editable=False,
+    )
+
+    objects = TitleQuerySet.as_manager()
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        """Не перезаписывает агрегаты, которые ведут отзывы.
+
+        Экземпляр мог быть загружен до изменения отзывов, поэтому при
+        обновлении сохраняются только редактируемые поля.
+        """
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in REVIEW_AGGREGATES
+            ]
+        super().save(*args, **kwargs)
+
+    @property
+    def histogram(self):
+        return {
+            score: getattr(self, field)
+            for score, field in zip(SCORES, HISTOGRAM_FIELDS)
+        }
+
+    @property
+    def median_score(self):
+        """Медиана оценок по гистограмме."""
+        if not self.review_count:
+            return None
+        middle = (self.review_count - 1) / 2
+        seen = 0
+        low = None
+        for score, count in self.histogram.items():
+            seen += count
+            if low is None and seen > middle:
+                low = score
+            if seen > middle + 0.5:
+                return (low + score) / 2
+        return None
+
+    def bayesian_rating(self, prior_mean, prior_weight):
+        """Рейтинг, сглаженный ``prior_weight`` оценками ``prior_mean``."""
+        if prior_mean is None:
+            return self.rating
+        return (
+            (prior_mean * prior_weight + self.score_sum)
+            / (prior_weight + self.review_count)
+        )
+
     class Meta:
         verbose_name = 'Произведение'
         verbose_name_plural = 'Произведения'
         ordering = ('id',)
 
 
+for score, field in zip(SCORES, HISTOGRAM_FIELDS):
+    Title.add_to_class(field, models.PositiveIntegerField(
+        verbose_name=f'Оценок {score}',
+        default=0,
+        editable=False,
+    ))
+
+
 class GenreTitle(models.Model):
     title = models.ForeignKey(Title, on_delete=models.CASCADE)
     genre = models.ForeignKey(Genre, on_delete=models.CASCADE)
 
 
+class ReviewQuerySet(models.QuerySet):
+    def bulk_add(self, reviews):
+        """Вставляет отзывы одним INSERT и сдвигает агрегаты произведений.
+
+        Строки произведений должны быть заблокированы вызывающим кодом,
+        проверка единственности отзыва тоже на нём.
+        """
+        with transaction.atomic(using=self.db, savepoint=False):
+            bulk_insert(self, reviews)
+            scores = defaultdict(list)
+            for review in reviews:
+                scores[review.title_id].append(review.score)
+            titles = Title.objects.db_manager(self.db)
+            rankings = Ranking.objects.db_manager(self.db)
+            for title_id, added in scores.items():
+                titles.apply_review_scores(title_id, added=added)
+                rankings.refresh_title(title_id)
+                rankings.bump_trending(title_id, len(added))
+        return reviews
+
+
 class Review(models.Model):
     title = models.ForeignKey(
         Title,
@@ -118,11 +366,81 @@ class Review(models.Model):
         'Дата публикации',
         auto_now_add=True
     )
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
+
+    objects = ReviewQuerySet.as_manager()
+
+    _loaded_score = None
+    _loaded_title_id = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_score = instance.__dict__.get('score')
+        instance._loaded_title_id = instance.__dict__.get('title_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        """Сохраняет отзыв и сдвигает агрегаты произведения.
+
+        Новый отзыв сначала учитывается в агрегатах: UPDATE строки
+        произведения блокирует её до конца транзакции и заодно проверяет,
+        что произведение существует (иначе ``Title.DoesNotExist``).
+        Повторный отзыв того же автора отклоняет ограничение
+        ``one_review`` при INSERT, и вся транзакция откатывается.
+        """
+        adding = self._state.adding
+        using = kwargs.get('using') or self._state.db
+        # Своя точка сохранения не нужна: кто обрабатывает IntegrityError,
+        # оборачивает сохранение в atomic() (см. ReviewSerializer.create).
+        with transaction.atomic(using=using, savepoint=False):
+            if not adding and (self._loaded_score is None
+                               or self._loaded_title_id is None):
+                self._loaded_score, self._loaded_title_id = (
+                    Review.objects.using(using).filter(pk=self.pk)
+                    .values_list('score', 'title_id').get()
+                )
+            titles = Title.objects.db_manager(using)
+            rankings = Ranking.objects.db_manager(using)
+            if adding and not titles.apply_review_delta(
+                self.title_id, added=self.score
+            ):
+                raise Title.DoesNotExist
+            super().save(*args, **kwargs)
+            if adding:
+                rankings.refresh_title(self.title_id)
+                rankings.bump_trending(self.title_id, 1)
+            elif self._loaded_title_id != self.title_id:
+                titles.apply_review_delta(
+                    self._loaded_title_id, removed=self._loaded_score
+                )
+                titles.apply_review_delta(self.title_id, added=self.score)
+                rankings.refresh_title(self._loaded_title_id)
+                rankings.refresh_title(self.title_id)
+            elif self._loaded_score != self.score:
+                titles.apply_review_delta(
+                    self.title_id,
+                    added=self.score,
+                    removed=self._loaded_score,
+                )
+                rankings.refresh_title(self.title_id)
+        self._loaded_score = self.score
+        self._loaded_title_id = self.title_id
 
     class Meta:
         verbose_name = 'Отзыв'
         verbose_name_plural = 'Отзывы'
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(
+                fields=('title', '-pub_date', '-id'),
+                name='review_title_pub_date_idx'
+            ),
+            models.Index(fields=('pub_date',), name='review_pub_date_idx'),
+            models.Index(
+                fields=('updated_at',), name='review_updated_at_idx'
+            ),
+        )
         constraints = (
             models.UniqueConstraint(
                 fields=('title', 'author',),
@@ -148,8 +466,218 @@ class Comment(models.Model):
         'Дата публикации',
         auto_now_add=True
     )
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
 
     class Meta:
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(
+                fields=('review', '-pub_date', '-id'),
+                name='comment_review_pub_date_idx'
+            ),
+            models.Index(
+                fields=('updated_at',), name='comment_updated_at_idx'
+            ),
+        )
+
+
+class CommentJournalMark(models.Model):
+    """Последняя запись локального журнала, перенесённая в базу.
+
+    Обновляется в одной транзакции со вставкой пакета комментариев, см.
+    ``reviews.journal``.
+    """
+    journal = models.CharField('Журнал', max_length=32, primary_key=True)
+    last_entry = models.BigIntegerField('Последняя запись', default=0)
+
+    class Meta:
+        verbose_name = 'Отметка журнала комментариев'
+        verbose_name_plural = 'Отметки журналов комментариев'
+
+
+def trending_since():
+    return timezone.now() - timedelta(hours=settings.TRENDING_WINDOW_HOURS)
+
+
+class RankingQuerySet(models.QuerySet):
+    """Строки рейтинговых таблиц.
+
+    У каждого произведения есть строка в общей таблице ``top``, в
+    таблице своей категории и в таблицах своих жанров; отзывы обновляют
+    их на месте. ``trending`` считает отзывы за последние
+    ``TRENDING_WINDOW_HOURS`` часов: новые отзывы прибавляются сразу,
+    а устаревшие вычитаются при сжатии, см. ``rebuild_trending``.
+    """
+
+    def board(self, name):
+        return self.filter(board=name, score__gt=0)
+
+    def refresh_title(self, title_id):
+        """Переносит текущий рейтинг произведения во все его таблицы."""
+        return self.filter(
+            title_id=title_id, board__startswith=BOARD_TOP
+        ).update(score=Subquery(
+            Title.objects.filter(pk=title_id).values('rating')[:1]
+        ))
+
+    def sync_title(self, title_id):
+        """Пересобирает строки после смены категории или жанров."""
+        title = Title.objects.using(self.db).filter(
+            pk=title_id
+        ).values_list('category_id', 'rating').first()
+        self.filter(title_id=title_id, board__startswith=BOARD_TOP).delete()
+        if title is None:
+            return
+        category_id, rating = title
+        boards = [BOARD_TOP]
+        if category_id is not None:
+            boards.append(BOARD_CATEGORY.format(category_id))
+        boards += [
+            BOARD_GENRE.format(genre_id)
+            for genre_id in GenreTitle.objects.using(self.db).filter(
+                title_id=title_id
+            ).values_list('genre_id', flat=True)
+        ]
+        self.bulk_create(
+            Ranking(board=board, title_id=title_id, score=rating)
+            for board in boards
+        )
+
+    def bump_trending(self, title_id, delta):
+        updated = self.filter(
+            board=BOARD_TRENDING, title_id=title_id
+        ).update(score=F('score') + delta)
+        if updated or delta < 0:
+            return
+        try:
+            with transaction.atomic(using=self.db):
+                self.create(
+                    board=BOARD_TRENDING, title_id=title_id, score=delta
+                )
+        except IntegrityError:
+            self.bump_trending(title_id, delta)
+
+    def rebuild_top(self):
+        self.filter(board__startswith=BOARD_TOP).delete()
+        self.bulk_create_rows(self.iter_title_rows())
+        genres = GenreTitle.objects.using(self.db).values_list(
+            'genre_id', 'title_id', 'title__rating'
+        )
+        self.bulk_create_rows(
+            (BOARD_GENRE.format(genre_id), title_id, rating)
+            for genre_id, title_id, rating in genres.iterator()
+        )
+
+    def iter_title_rows(self):
+        titles = Title.objects.using(self.db).values_list(
+            'id', 'category_id', 'rating'
+        )
+        for title_id, category_id, rating in titles.iterator():
+            yield BOARD_TOP, title_id, rating
+            if category_id is not None:
+                yield BOARD_CATEGORY.format(category_id), title_id, rating
+
+    def rebuild_trending(self, since):
+        """Сдвигает окно ``trending``: пересчитывает отзывы после ``since``.
+
+        Читаются только отзывы из окна, по индексу ``review_pub_date_idx``.
+        """
+        self.filter(board=BOARD_TRENDING).delete()
+        counts = Review.objects.using(self.db).filter(
+            pub_date__gte=since
+        ).order_by().values('title').annotate(total=Count('id'))
+        self.bulk_create_rows(
+            (BOARD_TRENDING, row['title'], row['total'])
+            for row in counts.iterator()
+        )
+
+    def bulk_create_rows(self, rows):
+        batch = []
+        for board, title_id, score in rows:
+            batch.append(Ranking(board=board, title_id=title_id, score=score))
+            if len(batch) == RANKING_BATCH_SIZE:
+                self.bulk_create(batch)
+                batch = []
+        self.bulk_create(batch)
+
+
+class Ranking(models.Model):
+    board = models.CharField('Таблица', max_length=64)
+    title = models.ForeignKey(
+        Title,
+        verbose_name='Произведение',
+        on_delete=models.CASCADE,
+        related_name='rankings',
+    )
+    score = models.FloatField('Значение', null=True)
+
+    objects = RankingQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Место в рейтинге'
+        verbose_name_plural = 'Рейтинги'
+        indexes = (
+            models.Index(
+                fields=('board', '-score', 'title'),
+                name='ranking_board_score_idx'
+            ),
+        )
+        constraints = (
+            models.UniqueConstraint(
+                fields=('board', 'title'),
+                name='one_ranking_per_board'
+            ),
+        )
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, using, **kwargs):
+    """Вызывается внутри транзакции удаления, в том числе каскадного."""
+    Title.objects.db_manager(using).apply_review_delta(
+        instance.title_id, removed=instance.score
+    )
+    rankings = Ranking.objects.db_manager(using)
+    rankings.refresh_title(instance.title_id)
+    if instance.pub_date >= trending_since():
+        rankings.bump_trending(instance.title_id, -1)
+
+
+@receiver(pre_save, sender=Comment)
+@receiver(pre_save, sender=Review)
+def fill_updated_at(sender, instance, raw, **kwargs):
+    """Дата изменения для фикстур без неё: при raw auto_now не работает."""
+    if raw and instance.updated_at is None:
+        instance.updated_at = instance.pub_date
+
+
+@receiver(post_save, sender=Title)
+def title_saved(sender, instance, using, raw, **kwargs):
+    if not raw:
+        Ranking.objects.db_manager(using).sync_title(instance.pk)
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def title_genres_changed(sender, instance, action, reverse, pk_set, using,
+                         **kwargs):
+    if not action.startswith('post_'):
+        return
+    rankings = Ranking.objects.db_manager(using)
+    if not reverse:
+        rankings.sync_title(instance.pk)
+        return
+    if action == 'post_clear':
+        rankings.filter(board=BOARD_GENRE.format(instance.pk)).delete()
+        return
+    for title_id in pk_set:
+        rankings.sync_title(title_id)
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Genre)
+def board_owner_deleted(sender, instance, using, **kwargs):
+    board = BOARD_CATEGORY if sender is Category else BOARD_GENRE
+    Ranking.objects.db_manager(using).filter(
+        board=board.format(instance.pk)
+    ).delete()
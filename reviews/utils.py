@@ -0,0 +1,29 @@
+from contextlib import contextmanager
+
+from django.db import connections, models
+
+
+@contextmanager
+def keep_pub_date(*models):
+    """Отключает auto_now_add, чтобы сохранить переданные даты."""
+    fields = [model._meta.get_field('pub_date') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def bulk_insert(queryset, objects):
+    """``bulk_create``, после которого у всех объектов есть id.
+
+    Где множественная вставка не возвращает id (SQLite), строки
+    вставляются по одной.
+    """
+    if connections[queryset.db].features.can_return_rows_from_bulk_insert:
+        return queryset.bulk_create(objects)
+    for instance in objects:
+        models.Model.save(instance, force_insert=True, using=queryset.db)
+    return objects
@@ -0,0 +1,22 @@
+from api_yamdb.settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+# Реплику включают только тесты роутера.
+DATABASE_REPLICAS = []
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+FACETS_BACKGROUND_REBUILD = False
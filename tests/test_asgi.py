@@ -0,0 +1,82 @@
+import asyncio
+import json
+import threading
+
+from asgiref.testing import ApplicationCommunicator
+from django.core.cache import cache
+from django.test import TransactionTestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api_yamdb.handlers import ASGIHandler
+from reviews.models import Category, Genre, Title
+from users.authentication import add_user_claims
+from users.models import User
+
+
+class ASGIHandlerTest(TransactionTestCase):
+    """Чтение и потоковые ответы в своих пулах потоков."""
+
+    def setUp(self):
+        cache.clear()
+        self.handler = ASGIHandler()
+        self.addCleanup(self.handler.read_executor.shutdown)
+        self.addCleanup(self.handler.stream_executor.shutdown)
+        self.threads = []
+        get_response_sync = self.handler.get_response_sync
+
+        def record_thread(request):
+            self.threads.append(threading.current_thread().name)
+            return get_response_sync(request)
+
+        self.handler.get_response_sync = record_thread
+        Genre.objects.create(name='Драма', slug='drama')
+
+    def request(self, method, path, query='', headers=()):
+        async def communicate():
+            communicator = ApplicationCommunicator(self.handler, {
+                'type': 'http',
+                'method': method,
+                'path': path,
+                'query_string': query.encode(),
+                'headers': list(headers),
+            })
+            await communicator.send_input({'type': 'http.request'})
+            start = await communicator.receive_output(10)
+            body = b''
+            while True:
+                message = await communicator.receive_output(10)
+                body += message.get('body', b'')
+                if not message.get('more_body'):
+                    break
+            await communicator.wait()
+            return start['status'], body
+
+        return asyncio.run(communicate())
+
+    def test_catalog_read_runs_in_read_pool(self):
+        status, body = self.request('GET', '/api/v1/genres/')
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)['results'][0]['slug'], 'drama')
+        self.assertTrue(self.threads[0].startswith('yamdb-read'))
+        status, _ = self.request('POST', '/api/v1/genres/')
+        self.assertEqual(status, 401)
+        self.assertFalse(self.threads[1].startswith('yamdb-read'))
+
+    def test_export_is_streamed(self):
+        category = Category.objects.create(name='Книги', slug='books')
+        for number in range(20):
+            Title.objects.create(
+                name=f'Произведение {number}', year=2000, category=category
+            )
+        admin = User.objects.create(
+            username='admin', email='a@x.ru', role='admin'
+        )
+        token = add_user_claims(AccessToken.for_user(admin), admin)
+        status, body = self.request(
+            'GET', '/api/v1/export/', 'resource=titles',
+            [(b'authorization', f'Bearer {token}'.encode())],
+        )
+        self.assertEqual(status, 200)
+        lines = body.decode().splitlines()
+        self.assertEqual(len(lines), 20)
+        self.assertEqual(json.loads(lines[-1])['name'], 'Произведение 19')
@@ -0,0 +1,58 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from reviews.models import Category, Title
+from users.authentication import add_user_claims
+from users.models import User
+
+USERS_URL = '/api/v1/users/'
+
+
+class StatelessJWTTest(TestCase):
+    """Права на безопасных методах берутся из токена и кэша прав."""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create(
+            username='admin', email='a@x.ru', role='admin'
+        )
+        category = Category.objects.create(name='Книги', slug='books')
+        title = Title.objects.create(name='T', year=2000, category=category)
+        self.reviews_url = f'/api/v1/titles/{title.id}/reviews/'
+
+    def client_for(self, user):
+        client = APIClient()
+        token = add_user_claims(AccessToken.for_user(user), user)
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return client
+
+    def test_safe_request_does_not_read_user(self):
+        client = self.client_for(self.admin)
+        self.assertEqual(client.get(self.reviews_url).status_code, 200)
+        with CaptureQueriesContext(connection) as anonymous:
+            APIClient().get(self.reviews_url)
+        with self.assertNumQueries(len(anonymous)):
+            self.assertEqual(client.get(self.reviews_url).status_code, 200)
+
+    def test_role_change_applies_to_issued_token(self):
+        client = self.client_for(self.admin)
+        self.assertEqual(client.get(USERS_URL).status_code, 200)
+        self.admin.role = 'user'
+        self.admin.save()
+        self.assertEqual(client.get(USERS_URL).status_code, 403)
+
+    def test_inactive_user_is_rejected(self):
+        client = self.client_for(self.admin)
+        self.admin.is_active = False
+        self.admin.save()
+        self.assertEqual(client.get(self.reviews_url).status_code, 401)
+
+    def test_write_reads_user_from_database(self):
+        client = self.client_for(self.admin)
+        response = client.post(self.reviews_url, {'text': 't', 'score': 5})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['author'], 'admin')
@@ -0,0 +1,107 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api import snapshot
+from api.serializers import SINGLE_REVIEW
+from api.views import MESS_REVIEW_NOT_FOUND, MESS_TITLE_NOT_FOUND
+from reviews.models import Category, Comment, Review, Title
+from users.models import User
+
+TITLES_URL = '/api/v1/titles/'
+
+
+class BulkCreateTest(TestCase):
+    """Пакетное создание отзывов и комментариев."""
+
+    def setUp(self):
+        category = Category.objects.create(name='Книги', slug='books')
+        self.titles = [
+            Title.objects.create(name=name, year=2000, category=category)
+            for name in ('A', 'B', 'C')
+        ]
+        self.author = User.objects.create(username='author', email='a@x')
+        self.review = Review.objects.create(
+            title=self.titles[2], author=self.author, text='t', score=1
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def test_reviews(self):
+        response = self.client.post('/api/v1/reviews/bulk/', [
+            {'title': self.titles[0].id, 'text': 't', 'score': 8},
+            {'title': self.titles[0].id, 'text': 't', 'score': 3},
+            {'title': self.titles[1].id, 'text': 't', 'score': 11},
+            {'title': self.titles[2].id, 'text': 't', 'score': 5},
+            {'title': 999, 'text': 't', 'score': 5},
+            {'title': self.titles[1].id, 'text': 't', 'score': 6},
+        ], format='json')
+        self.assertEqual(response.status_code, 201)
+        statuses = [item['status'] for item in response.data]
+        self.assertEqual(statuses, [201, 400, 400, 400, 400, 201])
+        self.assertEqual(
+            response.data[1]['errors'], {'non_field_errors': [SINGLE_REVIEW]}
+        )
+        self.assertIn('score', response.data[2]['errors'])
+        self.assertEqual(
+            response.data[4]['errors'], {'title': [MESS_TITLE_NOT_FOUND]}
+        )
+        self.assertEqual(response.data[0]['data']['author'], 'author')
+        title = Title.objects.get(pk=self.titles[0].pk)
+        self.assertEqual((title.review_count, title.rating), (1, 8))
+
+    def test_comments(self):
+        response = self.client.post('/api/v1/comments/bulk/', [
+            {'review': self.review.id, 'text': 'первый'},
+            {'review': 999, 'text': 'нет отзыва'},
+        ], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            response.data[1]['errors'], {'review': [MESS_REVIEW_NOT_FOUND]}
+        )
+        self.assertEqual(
+            list(Comment.objects.values_list('text', flat=True)), ['первый']
+        )
+
+    @override_settings(BULK_CREATE_MAX_SIZE=2)
+    def test_batch_size(self):
+        for data in ([], [{'review': self.review.id, 'text': 't'}] * 3, {}):
+            with self.subTest(data=data):
+                response = self.client.post(
+                    '/api/v1/comments/bulk/', data, format='json'
+                )
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(
+            APIClient().post('/api/v1/comments/bulk/', [], format='json')
+            .status_code,
+            401,
+        )
+
+
+class TitleBatchTest(TestCase):
+    """Произведения по списку id одним запросом."""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Книги', slug='books')
+        self.ids = [
+            Title.objects.create(name=name, year=2000, category=category).id
+            for name in ('A', 'B', 'C')
+        ]
+        snapshot.publish()
+
+    def get(self, ids):
+        return APIClient().get(TITLES_URL, {'ids': ids})
+
+    def test_order_and_missing_ids(self):
+        first, _, third = self.ids
+        response = self.get(f'{third},999,{first},{third}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['name'] for item in response.data], ['C', 'A'])
+
+    @override_settings(TITLE_BATCH_MAX_SIZE=2)
+    def test_invalid_ids(self):
+        for ids in ('', 'a,b', '1,2,3'):
+            with self.subTest(ids=ids):
+                self.assertEqual(self.get(ids).status_code, 400)
@@ -0,0 +1,59 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TransactionTestCase
+from rest_framework.test import APIClient
+
+from api import snapshot
+from reviews.models import Category, Title
+
+TITLES_URL = '/api/v1/titles/'
+NOW = 1700000000.25
+
+
+class CachedResponseTest(TransactionTestCase):
+    """Кэш ответов каталога, ETag и Last-Modified."""
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Книги', slug='books')
+        snapshot.publish()
+        self.client = APIClient()
+
+    def create_title(self, name):
+        return Title.objects.create(
+            name=name, year=2000, category=self.category
+        )
+
+    def test_cached_until_write(self):
+        self.create_title('Первое')
+        first = self.client.get(TITLES_URL)
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(0):
+            cached = self.client.get(TITLES_URL)
+        self.assertEqual(cached.data, first.data)
+        self.create_title('Второе')
+        self.assertEqual(self.client.get(TITLES_URL).data['count'], 2)
+
+    def test_etag_not_modified(self):
+        self.create_title('Первое')
+        etag = self.client.get(TITLES_URL)['ETag']
+        response = self.client.get(TITLES_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.create_title('Второе')
+        response = self.client.get(TITLES_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    @mock.patch('api.cache.time.time', return_value=NOW)
+    def test_write_in_same_second_changes_last_modified(self, time):
+        self.create_title('Первое')
+        first = self.client.get(TITLES_URL)
+        self.create_title('Второе')
+        response = self.client.get(
+            TITLES_URL, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+        self.assertNotEqual(
+            response['Last-Modified'], first['Last-Modified']
+        )
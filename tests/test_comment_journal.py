@@ -0,0 +1,70 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from reviews.journal import get_journal
+from reviews.models import Category, Comment, Review, Title
+from users.models import User
+
+
+class CommentJournalTest(TestCase):
+    """Отложенная запись комментариев через локальный журнал."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = override_settings(
+            COMMENT_WRITE_BEHIND=True,
+            COMMENT_JOURNAL_PATH=f'{directory}/journal.sqlite3',
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        category = Category.objects.create(name='Книги', slug='books')
+        title = Title.objects.create(name='T', year=2000, category=category)
+        reviewer = User.objects.create(username='reviewer', email='r@x.ru')
+        self.review = Review.objects.create(
+            title=title, author=reviewer, text='r', score=5
+        )
+        self.url = (
+            f'/api/v1/titles/{title.id}/reviews/{self.review.id}/comments/'
+        )
+
+    def post(self, user, text):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.post(self.url, {'text': text}, format='json')
+
+    def flush(self):
+        call_command('flush_comments', once=True, stdout=StringIO())
+
+    def test_accepted_comment_is_flushed(self):
+        author = User.objects.create(username='author', email='a@x.ru')
+        response = self.post(author, 'hello')
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(Comment.objects.exists())
+        client = APIClient()
+        client.force_authenticate(author)
+        results = client.get(self.url).data['results']
+        self.assertEqual([item['text'] for item in results], ['hello'])
+        self.flush()
+        comment = Comment.objects.get()
+        self.assertEqual((comment.author, comment.text), (author, 'hello'))
+        self.assertFalse(get_journal().pending_for(self.review.id, author.id))
+
+    def test_deleted_author_does_not_block_flush(self):
+        author = User.objects.create(username='author', email='a@x.ru')
+        other = User.objects.create(username='other', email='o@x.ru')
+        self.assertEqual(self.post(author, 'orphan').status_code, 202)
+        self.assertEqual(self.post(other, 'kept').status_code, 202)
+        author.delete()
+        self.flush()
+        self.assertEqual(
+            list(Comment.objects.values_list('text', flat=True)), ['kept']
+        )
+        self.flush()
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertFalse(get_journal().is_due(1, 0))
@@ -0,0 +1,71 @@
+from django.core.cache import cache
+from django.core.paginator import EmptyPage
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.paginations import CountingPaginator, no_count
+from reviews.models import Category, Title
+from users.models import User
+
+
+class CachedCountTest(TransactionTestCase):
+    """Число отзывов берётся из кэша до изменения отзывов."""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Книги', slug='books')
+        self.title = Title.objects.create(
+            name='T', year=2000, category=category
+        )
+        self.url = f'/api/v1/titles/{self.title.id}/reviews/'
+        self.add_review('first')
+
+    def add_review(self, username):
+        author = User.objects.create(username=username, email=f'{username}@x')
+        client = APIClient()
+        client.force_authenticate(author)
+        response = client.post(self.url, {'text': 't', 'score': 5})
+        self.assertEqual(response.status_code, 201)
+
+    def get(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = APIClient().get(self.url)
+        counts = [
+            query for query in queries.captured_queries
+            if 'COUNT(' in query['sql']
+        ]
+        return response.data['count'], len(counts)
+
+    def test_count_is_cached_until_review_write(self):
+        self.assertEqual(self.get(), (1, 1))
+        self.assertEqual(self.get(), (1, 0))
+        self.add_review('second')
+        self.assertEqual(self.get(), (2, 1))
+
+
+class CountingPaginatorTest(SimpleTestCase):
+    """Страницы без подсчёта узнают о следующей по лишней строке."""
+
+    def paginator(self):
+        return CountingPaginator(
+            list(range(12)), 5, counter=lambda rows: no_count(rows, None)
+        )
+
+    def test_pages_without_count(self):
+        paginator = self.paginator()
+        first = paginator.page(1)
+        self.assertEqual(list(first), [0, 1, 2, 3, 4])
+        self.assertTrue(first.has_next())
+        self.assertIsNone(paginator.count)
+        last = paginator.page(3)
+        self.assertEqual(list(last), [10, 11])
+        self.assertFalse(last.has_next())
+        self.assertTrue(last.has_previous())
+
+    def test_page_after_last(self):
+        with self.assertRaises(EmptyPage):
+            self.paginator().page(4)
+        with self.assertRaises(EmptyPage):
+            self.paginator().page(0)
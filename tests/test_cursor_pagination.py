@@ -0,0 +1,61 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from reviews.models import Category, Review, Title
+from users.models import User
+
+
+class CursorPaginationTest(TestCase):
+    """Курсорный обход отзывов по (pub_date, id)."""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Книги', slug='books')
+        title = Title.objects.create(name='T', year=2000, category=category)
+        now = timezone.now()
+        for number in range(12):
+            author = User.objects.create(
+                username=f'user{number}', email=f'u{number}@x.ru'
+            )
+            review = Review.objects.create(
+                title=title, author=author, text='t', score=5
+            )
+            # Первые отзывы опубликованы одновременно: порядок задаёт id.
+            Review.objects.filter(pk=review.pk).update(
+                pub_date=now + timedelta(seconds=max(number, 3))
+            )
+        self.url = f'/api/v1/titles/{title.id}/reviews/'
+        self.client = APIClient()
+
+    def test_walk_pages_without_count(self):
+        ids = []
+        url = f'{self.url}?cursor='
+        while url:
+            with self.assertNumQueries(2):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(
+            ids, list(Review.objects.order_by('-id').values_list(
+                'id', flat=True
+            ))
+        )
+
+    def test_previous_returns_first_page(self):
+        first = self.client.get(f'{self.url}?cursor=').data
+        second = self.client.get(first['next']).data
+        self.assertEqual(
+            self.client.get(second['previous']).data['results'],
+            first['results'],
+        )
+
+    def test_page_numbers_without_cursor(self):
+        response = self.client.get(self.url, {'page': 2})
+        self.assertEqual(response.data['count'], 12)
+        self.assertIsNotNone(response.data['previous'])
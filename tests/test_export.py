@@ -0,0 +1,103 @@
+import csv
+import json
+from datetime import timedelta
+from io import StringIO
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.test import APIClient
+
+from reviews.models import Category, Comment, Genre, Review, Title
+from users.models import User
+
+EXPORT_URL = '/api/v1/export/'
+
+
+@override_settings(EXPORT_OVERLAP=60)
+class ExportTest(TestCase):
+    """Потоковая выгрузка каталога для администратора."""
+
+    def setUp(self):
+        category = Category.objects.create(name='Книги', slug='books')
+        genres = [
+            Genre.objects.create(name=name, slug=slug)
+            for name, slug in (('Драма', 'drama'), ('Комедия', 'comedy'))
+        ]
+        self.title = Title.objects.create(
+            name='Первое', year=2000, category=category
+        )
+        self.title.genre.set(genres)
+        self.admin = User.objects.create(
+            username='admin', email='a@x.ru', role='admin'
+        )
+        self.old = Review.objects.create(
+            title=self.title, author=self.admin, text='старый', score=4
+        )
+        Review.objects.filter(pk=self.old.pk).update(
+            updated_at=timezone.now() - timedelta(hours=1)
+        )
+        reader = User.objects.create(username='reader', email='r@x.ru')
+        self.new = Review.objects.create(
+            title=self.title, author=reader, text='новый', score=8
+        )
+        Comment.objects.create(review=self.new, author=self.admin, text='c')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def get(self, **params):
+        response = self.client.get(EXPORT_URL, params)
+        self.assertEqual(response.status_code, 200)
+        body = b''.join(response.streaming_content).decode()
+        return response, body
+
+    def test_ndjson_catalog(self):
+        response, body = self.get()
+        records = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(
+            [record['type'] for record in records],
+            ['titles', 'reviews', 'reviews', 'comments'],
+        )
+        self.assertEqual(records[0]['genre'], ['comedy', 'drama'])
+        self.assertEqual(records[0]['category'], 'books')
+        self.assertEqual(records[2]['author'], 'reader')
+        watermark = parse_datetime(response['X-Export-Watermark'])
+        self.assertLessEqual(
+            parse_datetime(records[3]['updated_at']), watermark
+        )
+
+    def test_since_watermark_with_overlap(self):
+        since = timezone.now() - timedelta(seconds=30)
+        _, body = self.get(resource='reviews', since=since.isoformat())
+        self.assertEqual(
+            [json.loads(line)['text'] for line in body.splitlines()],
+            ['новый'],
+        )
+        # Окно расширяется назад на EXPORT_OVERLAP секунд.
+        self.new.text = 'исправленный'
+        self.new.save()
+        _, body = self.get(
+            resource='reviews', since=timezone.now().isoformat()
+        )
+        self.assertEqual(
+            [json.loads(line)['text'] for line in body.splitlines()],
+            ['исправленный'],
+        )
+
+    def test_csv_single_resource(self):
+        response, body = self.get(output='csv', resource='titles')
+        rows = list(csv.DictReader(StringIO(body)))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['genre'], 'comedy,drama')
+        self.assertEqual(rows[0]['review_count'], '2')
+
+    def test_bad_request_and_permissions(self):
+        for params in ({'output': 'xml'}, {'resource': 'users'},
+                       {'output': 'csv'}, {'since': 'вчера'}):
+            with self.subTest(params=params):
+                self.assertEqual(
+                    self.client.get(EXPORT_URL, params).status_code, 400
+                )
+        reader = APIClient()
+        reader.force_authenticate(User.objects.get(username='reader'))
+        self.assertEqual(reader.get(EXPORT_URL).status_code, 403)
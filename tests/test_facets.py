@@ -0,0 +1,75 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api import snapshot
+from reviews.models import Category, Genre, Title
+
+TITLES_URL = '/api/v1/titles/'
+
+
+class FacetedListTest(TestCase):
+    """Список произведений со счётчиками по жанрам, категориям и годам."""
+
+    def setUp(self):
+        cache.clear()
+        books = Category.objects.create(name='Книги', slug='books')
+        films = Category.objects.create(name='Фильмы', slug='films')
+        drama = Genre.objects.create(name='Драма', slug='drama')
+        comedy = Genre.objects.create(name='Комедия', slug='comedy')
+        for name, year, category, genres in (
+            ('Первое', 2000, books, [drama]),
+            ('Второе', 2000, books, [drama, comedy]),
+            ('Третье', 2010, films, [comedy]),
+            ('Четвёртое', 2010, films, []),
+        ):
+            title = Title.objects.create(
+                name=name, year=year, category=category
+            )
+            title.genre.set(genres)
+        snapshot.publish()
+        self.client = APIClient()
+
+    def get(self, **params):
+        response = self.client.get(TITLES_URL, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def counts(self, facet):
+        return {
+            item.get('slug', item.get('year')): item['count'] for item in facet
+        }
+
+    def test_counts_without_filters(self):
+        data = self.get(facets='')
+        self.assertEqual(data['count'], 4)
+        self.assertEqual(
+            self.counts(data['facets']['genre']), {'drama': 2, 'comedy': 2}
+        )
+        self.assertEqual(
+            self.counts(data['facets']['category']), {'books': 2, 'films': 2}
+        )
+        self.assertEqual(
+            self.counts(data['facets']['year']), {2000: 2, 2010: 2}
+        )
+
+    def test_filter_keeps_counts_of_own_dimension(self):
+        data = self.get(facets='genre,category', genre='comedy')
+        self.assertEqual(
+            sorted(item['name'] for item in data['results']),
+            ['Второе', 'Третье'],
+        )
+        self.assertEqual(
+            self.counts(data['facets']['genre']), {'drama': 2, 'comedy': 2}
+        )
+        self.assertEqual(
+            self.counts(data['facets']['category']), {'books': 1, 'films': 1}
+        )
+        self.assertNotIn('year', data['facets'])
+
+    def test_database_filters_narrow_counts(self):
+        data = self.get(facets='year', name='Втор', category='books')
+        self.assertEqual(
+            [item['name'] for item in data['results']], ['Второе']
+        )
+        self.assertEqual(self.counts(data['facets']['year']), {2000: 1})
@@ -0,0 +1,93 @@
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api import snapshot
+from reviews.models import Comment, Review, Title
+
+FILES = {
+    'category.csv': 'id,name,slug\n1,Книги,books\n',
+    'genre.csv': 'id,name,slug\n1,Драма,drama\n2,Комедия,comedy\n',
+    'users.csv': (
+        'id,username,email,role\n'
+        '1,reader,r@x.ru,user\n'
+        '2,writer,w@x.ru,moderator\n'
+    ),
+    'titles.ndjson': (
+        '{"id": 1, "name": "Первое", "year": 2000, "category": "books",'
+        ' "genre": ["drama", "comedy"]}\n'
+        '{"id": 2, "name": "Второе", "year": 2010, "category": 1,'
+        ' "genre": "2"}\n'
+    ),
+    'review.csv': (
+        'id,title_id,author,text,score,pub_date\n'
+        '1,1,1,Хорошо,8,2020-01-02T03:04:05Z\n'
+        '2,1,2,Плохо,3,2020-01-03T03:04:05Z\n'
+    ),
+    'comments.csv': 'id,review_id,author,text\n1,1,2,Согласен\n',
+}
+
+
+class ImportTest(TestCase):
+    """Загрузка каталога командой import_yamdb."""
+
+    def setUp(self):
+        cache.clear()
+        snapshot.publish()
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, files):
+        for name, content in files.items():
+            (self.directory / name).write_text(content, encoding='utf-8')
+
+    def load(self, *paths, **options):
+        call_command(
+            'import_yamdb', *(paths or [str(self.directory)]),
+            stdout=StringIO(), batch_size=1, **options
+        )
+
+    def test_import_directory(self):
+        APIClient().get('/api/v1/titles/')
+        self.write(FILES)
+        self.load()
+        first = Title.objects.get(pk=1)
+        self.assertEqual(
+            set(first.genre.values_list('slug', flat=True)),
+            {'drama', 'comedy'},
+        )
+        self.assertEqual((first.review_count, first.rating), (2, 5.5))
+        review = Review.objects.get(pk=1)
+        self.assertEqual(
+            review.pub_date.isoformat(), '2020-01-02T03:04:05+00:00'
+        )
+        self.assertEqual(Comment.objects.get().author.username, 'writer')
+        response = APIClient().get('/api/v1/titles/', {'genre': 'comedy'})
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(
+            APIClient().get('/api/v1/titles/top/').data[0]['name'], 'Первое'
+        )
+
+    def test_ignore_conflicts(self):
+        self.write(FILES)
+        self.load()
+        with self.assertRaises(IntegrityError):
+            self.load(str(self.directory / 'genre.csv'))
+        self.load(str(self.directory / 'genre.csv'), ignore_conflicts=True)
+
+    def test_unknown_file_and_slug(self):
+        self.write({'other.csv': 'id\n1\n'})
+        with self.assertRaisesMessage(CommandError, 'other.csv'):
+            self.load(str(self.directory / 'other.csv'))
+        self.write({'titles.csv': 'name,year,category\nT,2000,missing\n'})
+        with self.assertRaisesMessage(CommandError, 'missing'):
+            self.load(str(self.directory / 'titles.csv'))
+        self.assertFalse(Title.objects.exists())
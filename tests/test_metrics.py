@@ -0,0 +1,86 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api_yamdb import metrics
+
+GENRES_URL = '/api/v1/genres/'
+
+
+def parse(body):
+    """Значения метрик ``{строка имени с метками: число}``."""
+    return {
+        line.rsplit(' ', 1)[0]: float(line.rsplit(' ', 1)[1])
+        for line in body.splitlines()
+        if line and not line.startswith('#')
+    }
+
+
+@override_settings(METRICS_SAMPLE_RATE=1, METRICS_DIR='')
+class MetricsTest(TestCase):
+    """Метрики запросов в формате Prometheus."""
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(metrics, 'registry', metrics.Registry())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+
+    def scrape(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        return parse(response.content.decode())
+
+    def test_request_is_measured(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(GENRES_URL)
+        # Следующий запрос очистит журнал запросов соединения.
+        count = len(queries)
+        values = self.scrape()
+        labels = '{view="Genre-list"}'
+        self.assertEqual(values[f'yamdb_db_queries_total{labels}'], count)
+        self.assertEqual(
+            values[f'yamdb_http_response_size_bytes_total{labels}'],
+            len(response.content),
+        )
+        self.assertEqual(values[
+            'yamdb_http_request_duration_seconds_count'
+            '{view="Genre-list",method="GET",status="200"}'
+        ], 1)
+
+    @override_settings(METRICS_SAMPLE_RATE=0.5)
+    def test_sampled_request_is_weighted(self):
+        with mock.patch.object(metrics.random, 'random', return_value=0.9):
+            self.client.get(GENRES_URL)
+        self.assertNotIn(
+            'yamdb_db_queries_total{view="Genre-list"}', self.scrape()
+        )
+        with mock.patch.object(metrics.random, 'random', return_value=0.1):
+            self.client.get(GENRES_URL)
+        self.assertEqual(self.scrape()[
+            'yamdb_http_request_duration_seconds_count'
+            '{view="Genre-list",method="GET",status="200"}'
+        ], 2)
+
+    def test_dead_worker_is_folded_into_aggregate(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        key = json.dumps(['yamdb_db_queries_total', {'view': 'old'}])
+        dead = os.path.join(directory, 'worker-999999999-1.json')
+        metrics.write(dead, {'counters': {key: 5}, 'histograms': {}})
+        with override_settings(METRICS_DIR=directory):
+            first = self.scrape()
+            second = self.scrape()
+        self.assertEqual(first['yamdb_db_queries_total{view="old"}'], 5)
+        self.assertEqual(second['yamdb_db_queries_total{view="old"}'], 5)
+        self.assertFalse(os.path.exists(dead))
@@ -0,0 +1,71 @@
+from io import StringIO
+from unittest import mock
+
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from users.models import OutgoingEmail, User
+
+SIGNUP_URL = '/api/v1/auth/signup/'
+
+
+class OutboxTest(TestCase):
+    """Письмо с кодом уходит не из запроса, а командой send_outbox."""
+
+    def signup(self, username):
+        response = APIClient().post(
+            SIGNUP_URL, {'username': username, 'email': f'{username}@x.ru'}
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def send(self):
+        call_command('send_outbox', once=True, stdout=StringIO())
+
+    def test_signup_queues_confirmation_code(self):
+        self.signup('reader')
+        self.assertEqual(mail.outbox, [])
+        email = OutgoingEmail.objects.get()
+        self.assertTrue(User.objects.filter(username='reader').exists())
+        self.send()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['reader@x.ru'])
+        self.assertEqual(mail.outbox[0].body, email.body)
+        self.assertIsNotNone(OutgoingEmail.objects.get().sent_at)
+        self.send()
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_failed_email_is_retried_later(self):
+        self.signup('reader')
+        self.signup('writer')
+        send = EmailMessage.send
+
+        def refuse_reader(message, *args, **kwargs):
+            if message.to == ['reader@x.ru']:
+                raise ConnectionError('refused')
+            return send(message, *args, **kwargs)
+
+        with mock.patch.object(
+            EmailMessage, 'send', autospec=True, side_effect=refuse_reader
+        ):
+            self.send()
+        self.assertEqual(
+            [message.to for message in mail.outbox], [['writer@x.ru']]
+        )
+        failed = OutgoingEmail.objects.get(sent_at__isnull=True)
+        self.assertEqual((failed.to, failed.attempts), ('reader@x.ru', 1))
+        self.assertEqual(failed.last_error, 'refused')
+        self.assertGreater(failed.next_attempt_at, timezone.now())
+        self.send()
+        self.assertEqual(OutgoingEmail.objects.filter(
+            sent_at__isnull=True
+        ).count(), 1)
+        OutgoingEmail.objects.update(next_attempt_at=timezone.now())
+        self.send()
+        self.assertEqual(
+            [message.to for message in mail.outbox],
+            [['writer@x.ru'], ['reader@x.ru']],
+        )
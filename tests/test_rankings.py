@@ -0,0 +1,59 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api import snapshot
+from reviews.models import Category, Review, Title
+from users.models import User
+
+TRENDING_URL = '/api/v1/titles/trending/'
+TOP_URL = '/api/v1/titles/top/'
+
+
+class RankingsTest(TestCase):
+    """Таблицы лучших и популярных произведений."""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Книги', slug='books')
+        self.titles = [
+            Title.objects.create(name=name, year=2000, category=category)
+            for name in ('Первое', 'Второе')
+        ]
+        for index, (title, score) in enumerate(
+            ((self.titles[0], 4), (self.titles[1], 9), (self.titles[1], 8))
+        ):
+            author = User.objects.create(
+                username=f'user{index}', email=f'u{index}@x.ru'
+            )
+            Review.objects.create(
+                title=title, author=author, text='t', score=score
+            )
+        snapshot.publish()
+        self.client = APIClient()
+
+    def names(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return [item['name'] for item in response.data]
+
+    def test_top_and_trending_order(self):
+        self.assertEqual(self.names(TOP_URL), ['Второе', 'Первое'])
+        self.assertEqual(self.names(TOP_URL, limit=1), ['Второе'])
+        self.assertEqual(
+            self.names(TOP_URL, category='books'), ['Второе', 'Первое']
+        )
+        self.assertEqual(self.names(TRENDING_URL), ['Второе', 'Первое'])
+
+    def test_compaction_refreshes_cached_trending(self):
+        self.assertEqual(self.names(TRENDING_URL), ['Второе', 'Первое'])
+        Review.objects.filter(title=self.titles[1]).update(
+            pub_date=timezone.now() - timedelta(days=30)
+        )
+        call_command('compact_rankings', once=True, stdout=StringIO())
+        self.assertEqual(self.names(TRENDING_URL), ['Первое'])
@@ -0,0 +1,60 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api import snapshot
+from reviews.models import Category, Review, Title
+from users.models import User
+
+
+class TitleRatingTest(TestCase):
+    """Рейтинг хранится в произведении и сдвигается каждым отзывом."""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Книги', slug='books')
+        self.title = Title.objects.create(
+            name='T', year=2000, category=category
+        )
+        snapshot.publish()
+        self.url = f'/api/v1/titles/{self.title.id}/'
+
+    def client_for(self, username):
+        client = APIClient()
+        client.force_authenticate(User.objects.create(
+            username=username, email=f'{username}@x.ru'
+        ))
+        return client
+
+    def rating(self):
+        cache.clear()
+        return APIClient().get(self.url).data['rating']
+
+    def test_rating_follows_review_writes(self):
+        self.assertIsNone(self.rating())
+        first = self.client_for('first')
+        review_id = first.post(
+            f'{self.url}reviews/', {'text': 't', 'score': 4}
+        ).data['id']
+        second = self.client_for('second')
+        second.post(f'{self.url}reviews/', {'text': 't', 'score': 9})
+        self.assertEqual(self.rating(), 6.5)
+        review_url = f'{self.url}reviews/{review_id}/'
+        first.patch(review_url, {'score': 7})
+        self.assertEqual(self.rating(), 8)
+        first.delete(review_url)
+        self.assertEqual(self.rating(), 9)
+
+    def test_rebuild_ratings_restores_aggregates(self):
+        author = User.objects.create(username='author', email='a@x.ru')
+        Review.objects.create(
+            title=self.title, author=author, text='t', score=3
+        )
+        Title.objects.update(score_sum=0, review_count=0, rating=None)
+        call_command('rebuild_ratings', stdout=StringIO())
+        title = Title.objects.get()
+        self.assertEqual((title.score_sum, title.review_count), (3, 1))
+        self.assertEqual(self.rating(), 3)
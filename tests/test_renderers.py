@@ -0,0 +1,53 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+from io import BytesIO
+
+from django.test import SimpleTestCase
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api.renderers import FastJSONParser, FastJSONRenderer
+
+VALUES = (
+    {'rating': 5.75, 'count': 3, 'name': 'Сказка', 'empty': None},
+    [1e20, 1e-7, 1.5e300, 1e16, 0.1, -0.0, 5e-324],
+    {'big': 2 ** 70, 'negative': -2 ** 64},
+    {'text': 'формула 3e5 и 1e-7', 'separators': 'a\u2028b\u2029c'},
+    {'date': datetime(2021, 5, 1, 12, 30, tzinfo=timezone.utc)},
+    {'decimal': Decimal('1.50'), 1: 'int key'},
+)
+BODIES = (
+    b'{"a": 1}',
+    b'{"a": 1',
+    b'{"a": NaN}',
+    b'\xff',
+    b'',
+    b'[1,]',
+)
+
+
+class FastJSONTest(SimpleTestCase):
+    """orjson-рендерер и парсер ведут себя как стандартные."""
+
+    def test_render_matches_json_renderer(self):
+        for data in VALUES:
+            with self.subTest(data=data):
+                self.assertEqual(
+                    FastJSONRenderer().render(data),
+                    JSONRenderer().render(data),
+                )
+
+    def parse(self, parser, body):
+        try:
+            return parser.parse(BytesIO(body), parser_context={})
+        except ParseError as error:
+            return str(error.detail)
+
+    def test_parse_matches_json_parser(self):
+        for body in BODIES:
+            with self.subTest(body=body):
+                self.assertEqual(
+                    self.parse(FastJSONParser(), body),
+                    self.parse(JSONParser(), body),
+                )
@@ -0,0 +1,79 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from reviews.models import Category, Comment, Review, Title
+from users.models import User
+
+
+class ReviewQueriesTest(TestCase):
+    """Авторы отзывов и комментариев читаются без запроса на строку."""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Книги', slug='books')
+        self.title = Title.objects.create(
+            name='T', year=2000, category=category
+        )
+        self.client = APIClient()
+
+    def add_reviews(self, count):
+        for number in range(Review.objects.count(), count):
+            author = User.objects.create(
+                username=f'user{number}', email=f'u{number}@x.ru',
+                first_name='Имя',
+            )
+            review = Review.objects.create(
+                title=self.title, author=author, text='t', score=5
+            )
+            Comment.objects.create(review=review, author=author, text='c')
+        return review
+
+    def get(self, url, queries, **params):
+        cache.clear()
+        with self.assertNumQueries(queries):
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_reviews_list(self):
+        url = f'/api/v1/titles/{self.title.id}/reviews/'
+        for count in (2, 10):
+            self.add_reviews(count)
+            data = self.get(url, 3)
+            self.assertEqual(data['count'], count)
+            self.assertTrue(data['results'][0]['author'].startswith('user'))
+            data = self.get(url, 3, expand='author')
+            self.assertEqual(
+                data['results'][0]['author']['first_name'], 'Имя'
+            )
+
+    def test_comments_list(self):
+        for count in (2, 10):
+            review = self.add_reviews(count)
+            Comment.objects.bulk_create(
+                Comment(review=review, author=review.author, text='c')
+                for _ in range(count)
+            )
+            url = (
+                f'/api/v1/titles/{self.title.id}/reviews/{review.id}/'
+                'comments/'
+            )
+            data = self.get(url, 3)
+            self.assertEqual(data['count'], count + 1)
+            self.assertEqual(
+                {item['author'] for item in data['results']},
+                {review.author.username},
+            )
+
+    def test_comments_of_review_from_other_title(self):
+        review = self.add_reviews(1)
+        other = Title.objects.create(
+            name='Другое', year=2000, category=self.title.category
+        )
+        for title_id, review_id in ((other.id, review.id),
+                                    (self.title.id, review.id + 1)):
+            url = f'/api/v1/titles/{title_id}/reviews/{review_id}/comments/'
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 404)
@@ -0,0 +1,40 @@
+from unittest import mock
+
+from django.db import IntegrityError
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.serializers import SINGLE_REVIEW
+from reviews.models import Category, Review, Title
+from users.models import User
+
+
+class ReviewCreateTest(TestCase):
+    """Создание отзыва и ограничение «один отзыв на произведение»."""
+
+    def setUp(self):
+        category = Category.objects.create(name='Книги', slug='books')
+        self.title = Title.objects.create(
+            name='T', year=2000, category=category
+        )
+        self.author = User.objects.create(username='author', email='a@x.ru')
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+        self.url = f'/api/v1/titles/{self.title.id}/reviews/'
+
+    def post(self):
+        return self.client.post(self.url, {'text': 't', 'score': 7})
+
+    def test_second_review_is_rejected(self):
+        self.assertEqual(self.post().status_code, 201)
+        response = self.post()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['non_field_errors'], [SINGLE_REVIEW])
+        self.assertEqual(Review.objects.count(), 1)
+
+    def test_other_integrity_error_is_not_single_review(self):
+        with mock.patch.object(
+            Review, 'save', side_effect=IntegrityError('other constraint')
+        ):
+            with self.assertRaisesMessage(IntegrityError, 'other constraint'):
+                self.post()
@@ -0,0 +1,75 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connections
+from django.db.utils import OperationalError
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api_yamdb import routers
+from reviews.models import Category, Review, Title
+from users.models import User
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTest(TransactionTestCase):
+    """Чтение с реплики, закрепление после записи и отказ реплики.
+
+    ``replica`` - зеркало тестовой базы со своим соединением: откуда
+    прочитан ответ, видно по запросам соединения.
+    """
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        routers.unhealthy_until.clear()
+        routers.lag_checked_until.clear()
+        self.addCleanup(routers.unhealthy_until.clear)
+        category = Category.objects.create(name='Книги', slug='books')
+        title = Title.objects.create(name='T', year=2000, category=category)
+        reviewer = User.objects.create(username='reviewer', email='r@x.ru')
+        self.writer = User.objects.create(username='writer', email='w@x.ru')
+        Review.objects.create(title=title, author=reviewer, text='r', score=5)
+        self.url = f'/api/v1/titles/{title.id}/reviews/'
+
+    def read(self, user=None, replica_down=False):
+        """Читает список отзывов; возвращает число запросов к реплике."""
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        replica = connections['replica']
+        with CaptureQueriesContext(replica) as queries, mock.patch.object(
+            replica, 'ensure_connection',
+            side_effect=(
+                OperationalError if replica_down
+                else replica.ensure_connection
+            ),
+        ):
+            response = client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_safe_request_reads_replica(self):
+        self.assertGreater(self.read(), 0)
+        self.assertGreater(self.read(self.writer), 0)
+
+    def test_writer_is_pinned_to_primary(self):
+        client = APIClient()
+        client.force_authenticate(self.writer)
+        with CaptureQueriesContext(connections['replica']) as queries:
+            response = client.post(self.url, {'text': 'new', 'score': 7})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(self.read(self.writer), 0)
+        self.assertGreater(self.read(), 0)
+
+    def test_unavailable_replica_falls_back_to_primary(self):
+        self.assertEqual(self.read(replica_down=True), 0)
+        # Реплика пропускается до REPLICA_RETRY_SECONDS.
+        self.assertEqual(self.read(), 0)
+
+    @override_settings(REPLICA_MAX_LAG=5)
+    def test_lagging_replica_falls_back_to_primary(self):
+        with mock.patch.object(routers, 'replication_lag', return_value=60):
+            self.assertEqual(self.read(), 0)
@@ -0,0 +1,45 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api import snapshot
+from reviews.models import Category, Title
+
+TITLES_URL = '/api/v1/titles/'
+
+
+class TitleSearchTest(TestCase):
+    """Полнотекстовый поиск по индексу из миграции 0005."""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Книги', slug='books')
+        for name, description in (
+            ('Марсианские хроники', 'Рассказы о колонизации Марса'),
+            ('Винни-Пух', 'Сказка о медвежонке'),
+            ('Хроники Нарнии', ''),
+        ):
+            Title.objects.create(
+                name=name, description=description, year=2000,
+                category=category,
+            )
+        snapshot.publish()
+        self.client = APIClient()
+
+    def search(self, query):
+        response = self.client.get(TITLES_URL, {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return sorted(item['name'] for item in response.data['results'])
+
+    def test_search_by_name_and_description(self):
+        self.assertEqual(
+            self.search('хроники'), ['Марсианские хроники', 'Хроники Нарнии']
+        )
+        self.assertEqual(self.search('медвеж'), ['Винни-Пух'])
+        self.assertEqual(self.search('хроники марс'), ['Марсианские хроники'])
+
+    def test_index_follows_updates(self):
+        Title.objects.filter(name='Винни-Пух').update(name='Пух')
+        Title.objects.filter(name='Хроники Нарнии').delete()
+        self.assertEqual(self.search('хроники'), ['Марсианские хроники'])
+        self.assertEqual(self.search('пух'), ['Пух'])
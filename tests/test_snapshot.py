@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from api import snapshot
+from reviews.models import Genre
+
+ROWS = {
+    'genre': [(3, 'rock', 'Рок'), (1, 'драма', 'Драма'), (7, 'art', 'Арт')],
+    'category': [],
+}
+
+
+class SnapshotFileTest(SimpleTestCase):
+    """Двоичный поиск по слагу и id в отображённом файле."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'catalog.snapshot')
+        with open(self.path, 'wb') as file:
+            file.write(snapshot.pack(ROWS, 42))
+
+    def test_lookup(self):
+        current = snapshot.Snapshot(self.path)
+        self.assertEqual(current.generation, 42)
+        for rank, (pk, slug, name) in enumerate(ROWS['genre']):
+            with self.subTest(slug=slug):
+                self.assertEqual(
+                    current.by_slug('genre', slug), (pk, rank, slug, name)
+                )
+                self.assertEqual(
+                    current.by_id('genre', pk), (pk, rank, slug, name)
+                )
+        self.assertIsNone(current.by_slug('genre', 'jazz'))
+        self.assertIsNone(current.by_id('genre', 2))
+        self.assertIsNone(current.by_slug('category', 'rock'))
+
+
+class SnapshotPublishTest(TransactionTestCase):
+    """Снимок обновляется после фиксации изменений справочника."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        # После теста процесс должен вернуться к своему снимку.
+        self.addCleanup(snapshot.refresh, force=True)
+        settings = override_settings(CATALOG_SNAPSHOT_DIR=directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_saved_genre_is_published(self):
+        genre = Genre.objects.create(name='Рок', slug='rock')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(snapshot.resolve_slugs('genre', ['rock']),
+                             [genre.id])
+            self.assertEqual(
+                snapshot.lookup('genre', genre.id)[2:], ('rock', 'Рок')
+            )
+        self.assertEqual(len(queries), 0)
+        genre.name = 'Рок-н-ролл'
+        genre.save()
+        self.assertEqual(snapshot.lookup('genre', genre.id)[3], 'Рок-н-ролл')
+        genre.delete()
+        self.assertEqual(snapshot.resolve_slugs('genre', ['rock']), [])
+
+    def test_missing_slug_is_read_from_database(self):
+        snapshot.publish()
+        # Изменение в обход сигналов: снимок о нём не знает.
+        Genre.objects.bulk_create([Genre(name='Джаз', slug='jazz')])
+        genre = Genre.objects.get()
+        self.assertEqual(snapshot.resolve_slugs('genre', ['jazz']), [genre.id])
+        self.assertEqual(
+            snapshot.lookup('genre', genre.id),
+            (genre.id, snapshot.UNRANKED, 'jazz', 'Джаз'),
+        )
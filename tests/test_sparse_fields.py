@@ -0,0 +1,71 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api import snapshot
+from reviews.models import Category, Genre, Review, Title
+from users.models import User
+
+TITLES_URL = '/api/v1/titles/'
+
+
+class SparseFieldsTest(TestCase):
+    """Параметры ``fields`` и ``expand`` произведений и отзывов."""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Книги', slug='books')
+        genre = Genre.objects.create(name='Драма', slug='drama')
+        self.title = Title.objects.create(
+            name='T', year=2000, category=category
+        )
+        self.title.genre.set([genre])
+        author = User.objects.create(
+            username='author', email='a@x.ru', bio='О себе'
+        )
+        Review.objects.create(
+            title=self.title, author=author, text='t', score=5
+        )
+        snapshot.publish()
+        self.client = APIClient()
+
+    def get(self, url, **params):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(queries)
+
+    def test_title_fields(self):
+        data, full = self.get(TITLES_URL)
+        self.assertEqual(
+            data['results'][0]['genre'], [{'name': 'Драма', 'slug': 'drama'}]
+        )
+        data, sparse = self.get(TITLES_URL, fields='id,name')
+        self.assertEqual(data['results'], [{'id': self.title.id, 'name': 'T'}])
+        self.assertLess(sparse, full)
+
+    def test_collapsed_relations(self):
+        data, _ = self.get(TITLES_URL, expand='')
+        result = data['results'][0]
+        self.assertEqual((result['genre'], result['category']), (
+            ['drama'], 'books'
+        ))
+        data, _ = self.get(
+            f'{TITLES_URL}{self.title.id}/', fields='id,category',
+            expand='category',
+        )
+        self.assertEqual(data, {
+            'id': self.title.id,
+            'category': {'name': 'Книги', 'slug': 'books'},
+        })
+
+    def test_review_author(self):
+        url = f'{TITLES_URL}{self.title.id}/reviews/'
+        data, _ = self.get(url)
+        self.assertEqual(data['results'][0]['author'], 'author')
+        data, _ = self.get(url, fields='id,author', expand='author')
+        self.assertEqual(data['results'][0]['author']['bio'], 'О себе')
+        self.assertEqual(set(data['results'][0]), {'id', 'author'})
@@ -0,0 +1,69 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from reviews.models import Category, Review, Title
+from users.models import User
+
+
+@override_settings(RATING_PRIOR_WEIGHT=2)
+class TitleStatsTest(TestCase):
+    """Гистограмма оценок, медиана и байесовский рейтинг."""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Книги', slug='books')
+        self.titles = [
+            Title.objects.create(name=name, year=2000, category=category)
+            for name in ('A', 'B', 'C')
+        ]
+        self.users = [
+            User.objects.create(username=f'user{number}', email=f'{number}@x')
+            for number in range(4)
+        ]
+        for title, scores in ((self.titles[0], (2, 9, 10, 10)),
+                              (self.titles[1], (4,))):
+            for user, score in zip(self.users, scores):
+                Review.objects.create(
+                    title=title, author=user, text='t', score=score
+                )
+        self.client = APIClient()
+
+    def stats(self, title):
+        cache.clear()
+        response = self.client.get(f'/api/v1/titles/{title.id}/stats/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_stats(self):
+        stats = self.stats(self.titles[0])
+        self.assertEqual(stats['review_count'], 4)
+        self.assertEqual(
+            {score: count for score, count in stats['histogram'].items()
+             if count},
+            {'2': 1, '9': 1, '10': 2},
+        )
+        self.assertEqual(stats['mean'], 7.75)
+        self.assertEqual(stats['median'], 9.5)
+        # Среднее по каталогу 7.0 с весом двух оценок.
+        self.assertEqual(stats['bayesian_rating'], 7.5)
+
+    def test_title_without_reviews(self):
+        stats = self.stats(self.titles[2])
+        self.assertEqual(stats['review_count'], 0)
+        self.assertIsNone(stats['mean'])
+        self.assertIsNone(stats['median'])
+        self.assertEqual(stats['bayesian_rating'], 7.0)
+
+    def test_histogram_follows_score_change(self):
+        review = Review.objects.get(title=self.titles[0], score=2)
+        self.client.force_authenticate(review.author)
+        response = self.client.patch(
+            f'/api/v1/titles/{self.titles[0].id}/reviews/{review.id}/',
+            {'score': 9},
+        )
+        self.assertEqual(response.status_code, 200)
+        stats = self.stats(self.titles[0])
+        self.assertEqual(stats['histogram']['2'], 0)
+        self.assertEqual(stats['histogram']['9'], 2)
+        self.assertEqual(stats['median'], 9.5)
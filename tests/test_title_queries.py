@@ -0,0 +1,54 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api import snapshot
+from reviews.models import Category, Genre, Title
+
+TITLES_URL = '/api/v1/titles/'
+
+
+class TitleQueriesTest(TestCase):
+    """Число запросов к базе не зависит от числа произведений."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Книги', slug='books')
+        cls.genres = [
+            Genre.objects.create(name=f'Жанр {number}', slug=f'genre-{number}')
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        snapshot.publish()
+        self.client = APIClient()
+
+    def create_titles(self, count):
+        for number in range(count):
+            title = Title.objects.create(
+                name=f'Произведение {number}',
+                year=2000,
+                category=self.category,
+            )
+            title.genre.set(self.genres)
+        return title
+
+    def test_list(self):
+        self.create_titles(2)
+        with self.assertNumQueries(3):
+            response = self.client.get(TITLES_URL)
+        self.assertEqual(response.status_code, 200)
+        cache.clear()
+        self.create_titles(8)
+        with self.assertNumQueries(3):
+            response = self.client.get(TITLES_URL)
+        self.assertEqual(response.data['count'], 10)
+        self.assertEqual(len(response.data['results'][0]['genre']), 3)
+
+    def test_detail(self):
+        title = self.create_titles(1)
+        with self.assertNumQueries(2):
+            response = self.client.get(f'{TITLES_URL}{title.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['category']['slug'], 'books')
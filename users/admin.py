@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.conf import settings
 
-from .models import User
+from .models import OutgoingEmail, User
 
 
 @admin.register(User)
@@ -13,3 +13,15 @@ class UserAdmin(admin.ModelAdmin):
                     'email',
                     'role')
     empty_value_display = settings.VOID
+
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ('id',
+                    'to',
+                    'subject',
+                    'created_at',
+                    'attempts',
+                    'sent_at')
+    list_filter = ('sent_at',)
+    empty_value_display = settings.VOID
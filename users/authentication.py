@@ -0,0 +1,90 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.functional import cached_property
+from rest_framework import permissions
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import (AuthenticationFailed,
+                                                 InvalidToken)
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import CLAIMS_KEY, TOKEN_CLAIMS, User
+
+USER_NOT_FOUND = 'Пользователь не найден или неактивен'
+
+
+def add_user_claims(token, user):
+    for claim in TOKEN_CLAIMS:
+        token[claim] = getattr(user, claim)
+    return token
+
+
+def get_current_claims(user_id):
+    """Актуальные права пользователя с коротким временем жизни в кэше.
+
+    При изменении или удалении пользователя запись сбрасывается, поэтому
+    смена роли или блокировка вступают в силу не позже чем через
+    ``AUTH_CLAIMS_CACHE_TIMEOUT`` секунд даже при локальном кэше.
+    """
+    cache = caches[settings.AUTH_CLAIMS_CACHE_ALIAS]
+    key = CLAIMS_KEY.format(user_id)
+    claims = cache.get(key)
+    if claims is None:
+        claims = User.objects.filter(pk=user_id).values(
+            *TOKEN_CLAIMS, 'is_active'
+        ).first() or {'is_active': False}
+        cache.set(key, claims, settings.AUTH_CLAIMS_CACHE_TIMEOUT)
+    return claims
+
+
+class ClaimsUser(TokenUser):
+    """Пользователь, собранный из проверенных утверждений токена."""
+
+    def __init__(self, token, claims):
+        super().__init__(token)
+        self.claims = claims
+
+    @cached_property
+    def username(self):
+        return self.claims['username']
+
+    @cached_property
+    def role(self):
+        return self.claims['role']
+
+    @cached_property
+    def is_staff(self):
+        return self.claims['is_staff']
+
+    @cached_property
+    def is_superuser(self):
+        return self.claims['is_superuser']
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """JWT-аутентификация без чтения пользователя на безопасных методах.
+
+    Для GET/HEAD/OPTIONS пользователь строится из утверждений токена,
+    сверенных с кэшем прав. Изменяющие запросы, как и токены без
+    утверждений, получают полноценный объект ``User`` из базы данных.
+    """
+
+    def authenticate(self, request):
+        self.safe_request = request.method in permissions.SAFE_METHODS
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        if (not self.safe_request
+                or any(claim not in validated_token
+                       for claim in TOKEN_CLAIMS)):
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(
+                'Token contained no recognizable user identification'
+            )
+        claims = get_current_claims(user_id)
+        if not claims['is_active']:
+            raise AuthenticationFailed(USER_NOT_FOUND, code='user_inactive')
+        return ClaimsUser(validated_token, claims)
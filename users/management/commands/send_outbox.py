@@ -0,0 +1,109 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from users.models import OutgoingEmail
+
+
+class Command(BaseCommand):
+    help = 'Отправляет письма из очереди через одно SMTP-соединение'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Разобрать очередь один раз и завершиться',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.OUTBOX_BATCH_SIZE,
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=settings.OUTBOX_POLL_INTERVAL,
+            help='Пауза в секундах, когда очередь пуста',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            sent = self.drain(options['batch_size'])
+            if options['once']:
+                break
+            if not sent:
+                time.sleep(options['interval'])
+
+    def drain(self, batch_size):
+        total = 0
+        while True:
+            sent, processed = self.send_batch(batch_size)
+            total += sent
+            if processed < batch_size:
+                break
+        if total:
+            self.stdout.write(f'Отправлено писем: {total}')
+        return total
+
+    def claim(self, batch_size):
+        """Забирает пачку писем в короткой транзакции.
+
+        Взятые письма откладываются на ``OUTBOX_CLAIM_TIMEOUT`` секунд:
+        другие отправители их не видят, а если процесс упадёт посреди
+        отправки, письма снова станут доступны после этого срока.
+        """
+        with transaction.atomic():
+            emails = list(
+                OutgoingEmail.objects.due(settings.OUTBOX_MAX_ATTEMPTS)
+                .select_for_update(skip_locked=True)[:batch_size]
+            )
+            OutgoingEmail.objects.filter(
+                id__in=[email.id for email in emails]
+            ).update(next_attempt_at=timezone.now() + timedelta(
+                seconds=settings.OUTBOX_CLAIM_TIMEOUT
+            ))
+        return emails
+
+    def send_batch(self, batch_size):
+        emails = self.claim(batch_size)
+        if not emails:
+            return 0, 0
+        sent = []
+        failed = []
+        connection = get_connection()
+        try:
+            connection.open()
+        except Exception as error:
+            for email in emails:
+                email.schedule_retry(error, settings.OUTBOX_BACKOFF)
+            failed = emails
+        else:
+            with connection:
+                for email in emails:
+                    message = EmailMessage(
+                        email.subject,
+                        email.body,
+                        email.from_email,
+                        [email.to],
+                        connection=connection,
+                    )
+                    try:
+                        message.send()
+                    except Exception as error:
+                        email.schedule_retry(error, settings.OUTBOX_BACKOFF)
+                        failed.append(email)
+                    else:
+                        sent.append(email.id)
+        with transaction.atomic():
+            OutgoingEmail.objects.filter(id__in=sent).update(
+                sent_at=timezone.now()
+            )
+            OutgoingEmail.objects.bulk_update(
+                failed, ('attempts', 'last_error', 'next_attempt_at')
+            )
+        return len(sent), len(emails)
@@ -1,10 +1,19 @@
-from django.db import models
+from datetime import timedelta
+
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
+from django.core.cache import caches
+from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
 
 USER_ROLES = (
     ('user', 'Пользователь'),
     ('moderator', 'Модератор'),
     ('admin', 'Админ'),)
+TOKEN_CLAIMS = ('username', 'role', 'is_staff', 'is_superuser')
+CLAIMS_KEY = 'auth:claims:{}'
 
 
 class User(AbstractUser):
@@ -32,3 +41,64 @@ class User(AbstractUser):
 
     class Meta:
         ordering = ('-id',)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def reset_user_claims(sender, instance, **kwargs):
+    caches[settings.AUTH_CLAIMS_CACHE_ALIAS].delete(
+        CLAIMS_KEY.format(instance.pk)
+    )
+
+
+class OutgoingEmailQuerySet(models.QuerySet):
+    def due(self, max_attempts):
+        return self.filter(
+            sent_at__isnull=True,
+            attempts__lt=max_attempts,
+            next_attempt_at__lte=timezone.now(),
+        )
+
+
+class OutgoingEmail(models.Model):
+    """Письмо в очереди на отправку.
+
+    Запись создаётся в транзакции запроса, а доставкой занимается
+    команда ``send_outbox``, поэтому время ответа не зависит от
+    почтового сервера.
+    """
+    subject = models.CharField('Тема', max_length=255)
+    body = models.TextField('Текст')
+    from_email = models.CharField('Отправитель', max_length=254)
+    to = models.EmailField('Получатель', max_length=254)
+    created_at = models.DateTimeField('Создано', auto_now_add=True)
+    next_attempt_at = models.DateTimeField(
+        'Следующая попытка',
+        default=timezone.now,
+    )
+    attempts = models.PositiveSmallIntegerField('Попытки', default=0)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    sent_at = models.DateTimeField('Отправлено', null=True, blank=True)
+
+    objects = OutgoingEmailQuerySet.as_manager()
+
+    def __str__(self):
+        return f'{self.to}: {self.subject}'
+
+    def schedule_retry(self, error, backoff):
+        self.attempts += 1
+        self.last_error = str(error)
+        self.next_attempt_at = timezone.now() + timedelta(
+            seconds=backoff * 2 ** (self.attempts - 1)
+        )
+
+    class Meta:
+        verbose_name = 'Исходящее письмо'
+        verbose_name_plural = 'Исходящие письма'
+        ordering = ('id',)
+        indexes = (
+            models.Index(
+                fields=('sent_at', 'next_attempt_at'),
+                name='outgoing_email_due_idx'
+            ),
+        )